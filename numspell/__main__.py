@@ -5,7 +5,9 @@ import sys        # argv
 
 import numspell
 
+import langcache
 from argparse_formatter import FlexiFormatter
+from table import SpellingTable
 
 
 def discover_available_languages():
@@ -14,7 +16,128 @@ def discover_available_languages():
     filenames = os.listdir(os.path.dirname(sys.argv[0]))
     return [x.group(1) for x in map(f, filenames) if x]
 
+class InputError(Exception):
+    pass
+
+def read_lines(filenames):
+    """Generate (filename, line number, line) for non-blank input lines"""
+    for filename in filenames:
+        if filename == '-':
+            file_ = sys.stdin
+        else:
+            try:
+                file_ = open(filename)
+            except IOError as e:
+                raise InputError("%s: %s" % (filename, e.strerror))
+        try:
+            for lineno, line in enumerate(file_, 1):
+                line = line.rstrip('\r\n')
+                if line.strip():
+                    yield filename, lineno, line
+        finally:
+            if file_ is not sys.stdin:
+                file_.close()
+
+def parse_number(filename, lineno, string):
+    try:
+        return int(string)
+    except ValueError:
+        raise InputError("%s:%d: invalid number: %s" % (filename, lineno, string))
+
+def read_numbers(filenames, position):
+    """Generate the numbers of the input lines
+
+    position is updated to the [filename, line number] of the last number.
+
+    """
+    for filename, lineno, line in read_lines(filenames):
+        position[:] = [filename, lineno]
+        yield parse_number(filename, lineno, line)
+
+def read_pairs(filenames, position):
+    """Generate the (number, spelling) pairs of the input lines
+
+    position is updated to the [filename, line number] of the last pair.
+
+    """
+    for filename, lineno, line in read_lines(filenames):
+        position[:] = [filename, lineno]
+        if '\t' not in line:
+            raise InputError("%s:%d: expected number<TAB>spelling" % (filename, lineno))
+        num, spelling = line.split('\t', 1)
+        yield parse_number(filename, lineno, num), spelling
+
+def spelling_error(position, error):
+    """Return an InputError for a number the speller could not spell"""
+    if isinstance(error, IndexError):
+        message = "number too large to spell"
+    else:
+        message = str(error)
+    return InputError("%s:%d: %s" % (position[0], position[1], message))
+
+def format_result(num, spelling, tab):
+    if tab:
+        return '%d\t%s\n' % (num, spelling)
+    return spelling + '\n'
+
+def spell_stream(speller, filenames, tab, out):
+    """Spell every number read from the files, return the exit status"""
+    position = []
+    pairs = speller.spell_many(read_numbers(filenames, position), pairs=True)
+    try:
+        # Write every spelling as soon as it is ready, so that the lines
+        # preceding a failing one are all output
+        for num, spelling in pairs:
+            out.write(format_result(num, spelling, tab))
+    except (ValueError, IndexError) as e:
+        raise spelling_error(position, e)
+    return 0
+
+def check_stream(speller, filenames, tab, out):
+    """Check every number<TAB>spelling pair, return the exit status"""
+    status = 0
+    position = []
+    try:
+        for num, _, result in speller.check_many(read_pairs(filenames,
+                                                            position)):
+            out.write(format_result(num, result, tab))
+            status = 1
+    except (ValueError, IndexError) as e:
+        raise spelling_error(position, e)
+    return status
+
+def build_table_main(argv):
+    """Entry point of the build-table subcommand, return the exit status"""
+    parser = argparse.ArgumentParser(prog="spellnum build-table",
+                description='Write the spellings of a range of numbers to a '
+                            'table file which Speller(table_path=FILE) maps '
+                            'into memory')
+    parser.add_argument('-l', '--lang', type=str, default='en',
+            help="language code in ISO 639-1 format (default: en)")
+    parser.add_argument('--start', type=int, default=0,
+            help="first number of the range (default: 0)")
+    parser.add_argument('--stop', type=int, required=True,
+            help="number following the last one of the range")
+    parser.add_argument('-o', '--output', metavar='FILE', required=True,
+            help="path of the table file")
+    args = parser.parse_args(argv)
+    if not 0 <= args.start <= args.stop:
+        parser.error("the range must satisfy 0 <= start <= stop")
+
+    speller = numspell.Speller(args.lang, cache_size=0)
+    table = SpellingTable.build(speller, args.start, args.stop)
+    module = numspell.load_lang_module(args.lang)
+    try:
+        table.save(args.output, args.lang, langcache.source_digest(module))
+    except (IOError, OSError) as e:
+        print >>sys.stderr, "spellnum: %s: %s" % (args.output, e.strerror)
+        return 2
+    return 0
+
 def main():
+    if sys.argv[1:2] == ['build-table']:
+        exit(build_table_main(sys.argv[2:]))
+
     DEBUG_DESCR = """
 Print all of the steps taken to produce the spelling for a given number. \
 Useful for debugging purposes and to get to know the algorithm behind \
@@ -34,23 +157,58 @@ Provide your own spelling for numspell to check and correct.
 
 If the spelling is correct, exit with 0 status code. If the spelling is \
 wrong, output the correct spelling to stdout and exit with a non-zero \
-status code."""
+status code.
+
+When numbers are read from files or stdin, omit <spelling>. Each input line \
+must then contain a number and its spelling separated by a tab. Only the \
+correct spellings for wrong lines are output and the exit status is non-zero \
+if there was at least one."""
+
+    INPUT_DESCR = """
+Read newline-delimited integers from FILE and spell each of them. Use - to \
+read from stdin. This option can be given several times.
+
+If neither a number nor this option is given, numbers are read from stdin."""
+
+    TAB_DESCR = """
+Output number<TAB>spelling lines instead of bare spellings."""
 
     parser = argparse.ArgumentParser(prog="spellnum",
                 description='Spell integers in various languages',
                 formatter_class=FlexiFormatter)
-    parser.add_argument('num', metavar='number', type=int,
+    parser.add_argument('num', metavar='number', type=int, nargs='?',
             help="an integer to spell")
     parser.add_argument('-d', '--debug', action='store_const',
             const=True, default=False, help=DEBUG_DESCR)
     parser.add_argument('-l', '--lang', type=str, default='en',
             help=LANG_DESCR)
     parser.add_argument('-c', '--check', metavar='<spelling>', type=str,
-            help=CHECK_DESCR)
+            nargs='?', const=True, help=CHECK_DESCR)
+    parser.add_argument('-i', '--input', metavar='FILE', action='append',
+            help=INPUT_DESCR)
+    parser.add_argument('-t', '--tab', action='store_const',
+            const=True, default=False, help=TAB_DESCR)
     args = parser.parse_args()
 
+    if args.num is not None and args.input:
+        parser.error("a number cannot be combined with --input")
+    if args.num is not None and args.check is True:
+        parser.error("--check requires a spelling when a number is given")
+    if args.num is None and args.check not in (None, True):
+        parser.error("--check <spelling> requires a number")
+
     speller = numspell.Speller(args.lang, args.debug)
-    if args.check:
+    if args.num is None:
+        stream_fn = args.check and check_stream or spell_stream
+        try:
+            status = stream_fn(speller, args.input or ['-'], args.tab,
+                               sys.stdout)
+        except InputError as e:
+            sys.stdout.flush()
+            print >>sys.stderr, "spellnum: %s" % e
+            status = 2
+        exit(status)
+    elif args.check:
         result = speller.check(args.num, args.check)
         if result:
             print result
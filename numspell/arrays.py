@@ -0,0 +1,97 @@
+"""Spelling of NumPy arrays of integers
+
+This module imports NumPy, which numspell does not otherwise require. It is
+only imported by Speller.spell_array().
+
+Each distinct number of the array is spelled once and the spellings are
+gathered back into the shape of the array. The distinct numbers are split
+into the lowest group of digits, the one chopped off by the language's
+consuming rule, and the prefix above it with a single vectorized divmod.
+Numbers sharing a prefix are spelled with one RangeBlock, as in
+Speller.spell_range(): the higher groups are decomposed and run through the
+list passes once per prefix. Each distinct lowest group is decomposed once
+for the whole array.
+
+"""
+
+__all__ = ['spell_array']
+
+
+import numpy
+
+from numspell import RangeBlock
+
+
+def spell_array(speller, array, as_buffer=False):
+    """Return the spellings of the integers in array
+
+    Arguments:
+      speller    -- the Speller to use
+      array      -- an ndarray of integers, or anything numpy.asarray turns
+                    into one
+      as_buffer  -- if True then return a (buffer, offsets) tuple instead:
+                    the spelling of the i-th element of the flattened array
+                    is buffer[offsets[i]:offsets[i+1]]
+
+    Return value:
+      An array of objects with the shape of array, holding the spellings.
+      They are equal to those returned by speller.spell().
+
+    Spellings found in the speller's table or spelling cache are reused;
+    computed ones are not stored in the cache.
+
+    """
+    array = numpy.asarray(array)
+    if array.dtype.kind not in 'iu':
+        raise TypeError("Expected an array of integers, got %s" % array.dtype)
+    if array.size and array.dtype.kind == 'i' and array.min() < 0:
+        raise ValueError("Cannot spell a negative number: %d" % array.min())
+
+    unique, inverse = numpy.unique(array, return_inverse=True)
+    spellings = numpy.empty(len(unique), dtype=object)
+    spellings[:] = _spell_sorted(speller, unique)
+    if as_buffer:
+        lengths = numpy.array([len(x) for x in spellings], dtype=numpy.int64)
+        offsets = numpy.zeros(array.size + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths[inverse], out=offsets[1:])
+        return ''.join(spellings[inverse]), offsets
+    return spellings[inverse].reshape(array.shape)
+
+def _spell_sorted(speller, nums):
+    """Return the list of spellings of a sorted array of distinct numbers"""
+    cached = speller._cached
+    spell = speller._spell
+    values = nums.tolist()
+    digits = not speller._instrumented and speller._group_digits()
+    if not digits or not values:
+        return [cached(x) or spell(x) for x in values]
+
+    # The dtype of the divisor is that of nums, so that uint64 numbers are
+    # not converted to floats
+    prefixes, lows = numpy.divmod(nums, nums.dtype.type(10 ** digits))
+    bounds = numpy.flatnonzero(numpy.diff(prefixes)) + 1
+    starts = [0] + bounds.tolist()
+    ends = bounds.tolist() + [len(values)]
+    prefixes = prefixes.tolist()
+    lows = lows.tolist()
+
+    components = {}
+    result = []
+    for start, end in zip(starts, ends):
+        prefix = prefixes[start]
+        block = None
+        if prefix and end - start > 1:
+            block = RangeBlock(speller, str(prefix), digits)
+            if not block.valid:
+                block = None
+        for num, low in zip(values[start:end], lows[start:end]):
+            spelling = cached(num)
+            if spelling is None and block is not None and low:
+                parts = components.get(low)
+                if parts is None:
+                    parts = components[low] = speller._decompose(str(low))
+                spelling = block.spell(low, parts)
+            if spelling is None:
+                spelling = spell(num)
+            result.append(spelling)
+    return result
@@ -0,0 +1,190 @@
+"""Throughput benchmark for the numspell module
+
+Run it from the command line:
+
+    python -m numspell.benchmark [--lang=LANG ...] [--count=N]
+                                 [--pass-backend=list|regex]
+                                 [--output=FILE] [--baseline=FILE]
+
+For each language, Speller.spell and Speller.check are timed over several
+distributions of numbers. The results are printed as JSON. When a baseline
+file saved from a previous run is given, each result is compared against it
+and the exit status is non-zero if any of them is slower by more than the
+threshold.
+
+"""
+
+__all__ = ['DISTRIBUTIONS', 'run', 'compare', 'main']
+
+
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import timeit
+
+import numspell
+
+
+LANGUAGES = ['en', 'es', 'ja', 'ru']
+
+
+def group_base(speller):
+    """Return the multiplier between consecutive orders of the language"""
+    return 10 ** (speller._group_digits() or 3)
+
+def max_number(speller):
+    """Return the largest number the language has orders for"""
+    return group_base(speller) ** len(speller.ORDERS) - 1
+
+
+def small_ints(speller, count, rng):
+    return [rng.randrange(1000) for _ in xrange(count)]
+
+def dense_range(speller, count, rng):
+    start = min(10 ** 6, max_number(speller) - count)
+    return range(start, start + count)
+
+def random_64bit(speller, count, rng):
+    limit = min(2 ** 64 - 1, max_number(speller))
+    return [rng.randint(0, limit) for _ in xrange(count)]
+
+def order_boundaries(speller, count, rng):
+    base = group_base(speller)
+    boundaries = [base ** order for order in range(1, len(speller.ORDERS))]
+    return [boundaries[i % len(boundaries)] + rng.randint(-100, 100)
+            for i in xrange(count)]
+
+DISTRIBUTIONS = [
+    ('small', small_ints),
+    ('dense', dense_range),
+    ('random64', random_64bit),
+    ('boundaries', order_boundaries),
+]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+def measure(fn, args):
+    """Call fn on each of args, return a dict with timing statistics"""
+    timer = timeit.default_timer
+    latencies = []
+    start = timer()
+    for x in args:
+        t = timer()
+        fn(*x)
+        latencies.append(timer() - t)
+    total = timer() - start
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': len(latencies) / total if total else 0.0,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p90_us': percentile(latencies, 0.90) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+    }
+
+def run(languages=LANGUAGES, count=2000, seed=0, **options):
+    """Run the benchmark, return the results as a dict
+
+    options are passed to the Speller constructor.
+
+    """
+    results = {}
+    for lang in languages:
+        speller = numspell.Speller(lang, **options)
+        rng = random.Random(seed)
+        lang_results = results[lang] = {'spell': {}, 'check': {}}
+        for name, make_nums in DISTRIBUTIONS:
+            nums = make_nums(speller, count, rng)
+
+            speller.cache_clear()
+            lang_results['spell'][name] = measure(speller.spell,
+                                                  [(x,) for x in nums])
+            pairs = [(x, speller.spell(x)) for x in nums]
+
+            speller.cache_clear()
+            lang_results['check'][name] = measure(speller.check, pairs)
+
+    return {
+        'python': platform.python_version(),
+        'count': count,
+        'seed': seed,
+        'options': options,
+        'peak_memory_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=0.1):
+    """Compare two benchmark runs
+
+    Return a list of (lang, operation, distribution, ratio) tuples for the
+    results whose throughput dropped below (1 - threshold) times the baseline
+    throughput. Results missing from either run are ignored.
+
+    """
+    regressions = []
+    for lang, operations in sorted(current['results'].items()):
+        for op, distributions in sorted(operations.items()):
+            for dist, stats in sorted(distributions.items()):
+                try:
+                    base = baseline['results'][lang][op][dist]['ops_per_sec']
+                except KeyError:
+                    continue
+                if not base:
+                    continue
+                ratio = float(stats['ops_per_sec']) / base
+                if ratio < 1 - threshold:
+                    regressions.append((lang, op, dist, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m numspell.benchmark",
+                description='Measure the throughput of numspell')
+    parser.add_argument('-l', '--lang', action='append',
+            help="language to benchmark, can be given several times "
+                 "(default: all)")
+    parser.add_argument('-n', '--count', type=int, default=2000,
+            help="numbers per distribution (default: 2000)")
+    parser.add_argument('-s', '--seed', type=int, default=0,
+            help="random seed (default: 0)")
+    parser.add_argument('--pass-backend', choices=['list', 'regex'],
+            default='list',
+            help="how to apply the list passes (default: list)")
+    parser.add_argument('-o', '--output', metavar='FILE',
+            help="save the results to FILE instead of printing them")
+    parser.add_argument('-b', '--baseline', metavar='FILE',
+            help="compare the results with a previously saved run")
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+            help="allowed slowdown relative to the baseline (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    result = run(args.lang or LANGUAGES, args.count, args.seed,
+                 pass_backend=args.pass_backend)
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file_:
+            file_.write(output + '\n')
+    else:
+        print output
+
+    if args.baseline:
+        with open(args.baseline) as file_:
+            baseline = json.load(file_)
+        regressions = compare(result, baseline, args.threshold)
+        for lang, op, dist, ratio in regressions:
+            print >>sys.stderr, "regression: %s %s %s at %.0f%% of baseline" % (
+                    lang, op, dist, ratio * 100)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""Python code generated for the rules and passes of a language
+
+The rules and list passes of a language never change, so instead of walking
+the compiled plans and pattern automata for every number, a Speller can run
+Python code written for them. generate() returns the source of a module with:
+
+  decompose  -- appends the components of a window of a digit string to a
+                list, like Speller._decompose does for a whole string
+  rule<R>_<L> -- one function per rule R and number length L, applying the
+                rule's plan in straight-line code; rule<R>_long applies a
+                consuming rule to numbers longer than any pattern
+  pass<P>    -- one generator per list pass with the same protocol as
+                listparse.Parser.isub; the tokens of the pattern are checked
+                and the replacement is formatted inline
+
+The source is compiled once per language and process. If a cache directory
+is given, the code object is also marshalled into a file there, along with
+the digests of the language module and of this module.
+
+"""
+
+__all__ = ['generate', 'load', 'GeneratedLanguage', 'GeneratedPass']
+
+
+import logging
+import marshal
+import os
+import re
+import sys
+
+import langcache
+import numspell
+
+
+# Bump this whenever the generated code changes
+CODEGEN_VERSION = 1
+
+# Longer numbers are spelled by the regular engine, which does not recurse
+MAX_DIGITS = 300
+
+# Code objects compiled in this process, by language and digest
+_code_cache = {}
+
+
+class GeneratedLanguage(object):
+    """The functions generated for a language"""
+
+    def __init__(self, decompose, passes):
+        self.decompose = decompose
+        self.passes = passes
+        self.max_digits = MAX_DIGITS
+
+
+class GeneratedPass(object):
+    """A generated list pass usable in place of a listparse.Parser"""
+
+    def __init__(self, template, isub):
+        self.template = template
+        self.isub = isub
+
+
+def cache_path(cache_dir, lang):
+    """Return the path of the file with the generated code for the language"""
+    return os.path.join(cache_dir, "codegen_%s.v%d.cache"
+                        % (lang, CODEGEN_VERSION))
+
+def load(speller, module, cache_dir=None):
+    """Return a GeneratedLanguage for the rules and passes of the Speller
+
+    module is the Speller's language module. The code object is taken from
+    memory or the cache directory if it is up to date, otherwise it is
+    generated and compiled anew.
+
+    """
+    digest = "%s:%s" % (langcache.source_digest(module),
+                        langcache.source_digest(sys.modules[__name__]))
+    key = (speller.lang, digest)
+    code = _code_cache.get(key)
+    if code is None and cache_dir:
+        path = cache_path(cache_dir, speller.lang)
+        payload = langcache.load(path, digest)
+        if payload is not None:
+            try:
+                code = marshal.loads(payload)
+            except (EOFError, ValueError, TypeError):
+                code = None
+    if code is None:
+        source = generate(speller._rule_table, speller._parsers,
+                          speller._number_strs)
+        code = compile(source, "<numspell.codegen %s>" % speller.lang, 'exec')
+        if cache_dir and not langcache.store(path, digest, marshal.dumps(code)):
+            logging.warning("Could not write the cache file %s", path)
+    _code_cache[key] = code
+
+    namespace = {'NUMBER_STRS': speller._number_strs, 'META': speller.META}
+    exec code in namespace
+    passes = [GeneratedPass(parser.template, namespace['pass%d' % index])
+              for index, parser in enumerate(speller._parsers)]
+    return GeneratedLanguage(namespace['decompose'], passes)
+
+
+def generate(rule_table, parsers, number_strs):
+    """Return the source of the module for a RuleTable and parsers"""
+    lines = ["# Generated by numspell.codegen, version %d" % CODEGEN_VERSION]
+    max_length = rule_table.max_length
+    max_key = max([len(x) for x in number_strs] + [0])
+
+    dispatch = ['None']
+    for length in range(1, max_length + 1):
+        dispatch.append(_generate_length(lines, rule_table, length))
+    long_name = _generate_long(lines, rule_table, max_length)
+
+    lines.append("")
+    lines.append("BY_LENGTH = [%s]" % ', '.join(dispatch))
+    lines.append("""
+def decompose(numstr, start, end, out):
+    while start < end and numstr[start] == '0':
+        start += 1
+    length = end - start
+    if length <= %d:
+        if not length:
+            return
+        number = NUMBER_STRS.get(numstr[start:end])
+        if number is not None:
+            out.append(number)
+            return
+    if length <= %d:
+        BY_LENGTH[length](numstr, start, out)
+    else:
+        %s(numstr, start, end, out)""" % (max_key, max_length, long_name))
+
+    names = {}
+    for index, parser in enumerate(parsers):
+        _generate_pass(lines, index, parser, names)
+    lines[1:1] = ["%s = META[%r]" % (name, key)
+                  for key, name in sorted(names.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def _generate_length(lines, rule_table, length):
+    """Generate the functions for numbers of the given length
+
+    Return the name of the function to call for such numbers.
+
+    """
+    candidates = rule_table.candidates(length)
+
+    branches = []
+    for constraints, rule, plan in candidates:
+        name = "rule%d_%d" % (rule_table.rules.index(rule), length)
+        lines.append("")
+        lines.append("def %s(numstr, s, out):" % name)
+        lines.append("    # %s = %s" % (rule.pattern, rule.body))
+        bounds = lambda span: (_offset('s', span[0]), _offset('s', span[1]))
+        for line in _generate_plan(plan, bounds):
+            lines.append("    " + line)
+        if not constraints:
+            if not branches:
+                return name
+            branches.append(("True", name))
+            break
+        branches.append((' and '.join("numstr[s + %d] == %r" % x
+                                      for x in constraints), name))
+
+    name = "length_%d" % length
+    lines.append("")
+    lines.append("def %s(numstr, s, out):" % name)
+    for condition, rule_name in branches:
+        lines.append("    if %s:" % condition)
+        lines.append("        return %s(numstr, s, out)" % rule_name)
+    if not branches or branches[-1][0] != "True":
+        lines.append("    raise Exception('Could not find a suitable rule "
+                     "for the number %%s' %% numstr[s:s + %d])" % length)
+    return name
+
+def _generate_long(lines, rule_table, max_length):
+    """Generate the function for numbers longer than any pattern
+
+    Only consuming rules match such numbers and they impose no digits, so
+    the first of them always applies. Its spans are fixed relative to
+    either end of the number: the RuleTable finds them by comparing its
+    plans for two lengths.
+
+    """
+    lines.append("")
+    if rule_table._long is None:
+        lines.append("def decompose_long(numstr, s, e, out):")
+        lines.append("    raise Exception('Could not find a suitable rule "
+                     "for the number %s' % numstr[s:e])")
+        return 'decompose_long'
+
+    rule, short_plan, long_plan = rule_table._long
+    bounds = {}
+    for short, long_ in zip(_spans(short_plan), _spans(long_plan)):
+        bounds[short] = tuple(_end_relative(x, y, max_length + 1)
+                              for x, y in zip(short, long_))
+
+    name = "rule%d_long" % rule_table.rules.index(rule)
+    lines.append("def %s(numstr, s, e, out):" % name)
+    lines.append("    # %s = %s" % (rule.pattern, rule.body))
+    for line in _generate_plan(short_plan, bounds.get):
+        lines.append("    " + line)
+    return name
+
+def _spans(plan):
+    """Generate the spans of digits used by a plan"""
+    for kind, value in plan:
+        if kind == numspell.SLICE:
+            yield value
+        elif kind == numspell.COMPOSITE:
+            for piece in value:
+                if type(piece) is tuple:
+                    yield piece
+
+def _end_relative(short, long_, length):
+    """Return the expression of a span boundary found in plans for numbers
+    of length and length + 1 digits
+
+    """
+    if short == long_:
+        return _offset('s', short)
+    assert long_ == short + 1
+    if short == length:
+        return 'e'
+    return "e - %d" % (length - short)
+
+def _offset(base, offset):
+    if offset < 0:
+        return "%s - %d" % (base, -offset)
+    if offset > 0:
+        return "%s + %d" % (base, offset)
+    return base
+
+def _generate_plan(plan, bounds):
+    """Generate the statements applying a plan
+
+    bounds is a function returning the expressions of both boundaries of a
+    span of the plan.
+
+    """
+    for kind, value in plan:
+        if kind == numspell.LITERAL:
+            yield "out.append(%r)" % value
+        elif kind == numspell.ORDER:
+            yield "out.append(0)"
+        elif kind == numspell.SLICE:
+            yield "decompose(numstr, %s, %s, out)" % bounds(value)
+        else:
+            # Adjacent literal digits are joined into one constant
+            pieces = []
+            for piece in value:
+                if type(piece) is tuple:
+                    pieces.append("numstr[%s:%s]" % bounds(piece))
+                elif pieces and type(pieces[-1]) is list:
+                    pieces[-1].append(piece)
+                else:
+                    pieces.append([piece])
+            yield "x = %s" % ' + '.join(type(x) is list and repr(''.join(x))
+                                        or x for x in pieces)
+            yield "decompose(x, 0, len(x), out)"
+
+
+def _generate_pass(lines, index, parser, names):
+    """Generate the generator function applying one list pass
+
+    names maps each key of the META dict used by the pass to the name of a
+    global variable holding the function.
+
+    """
+    def meta(key):
+        if key not in names:
+            names[key] = "m%d_%s" % (len(names), re.sub(r'\W', '_', key))
+        return names[key]
+
+    pattern = parser.pattern
+    body = parser.body
+    length = pattern.length
+    lines.append("")
+    lines.append("def pass%d(e):" % index)
+    lines.append("    # %s" % parser.template)
+    if not length:
+        lines.append("    return")
+        lines.append("    yield")
+        return
+
+    conditions = []
+    for pos, token in enumerate(pattern.core):
+        if hasattr(token, 'string'):
+            conditions.append("e[%s] == %r" % (_offset('p', pos),
+                                               token.string))
+        else:
+            conditions.append("%s(e[%s])" % (meta(token.name + "~find"),
+                                             _offset('p', pos)))
+
+    args = []
+    for sub, wrappers in zip(body.format_indices, body.format_wrappers):
+        pos = pattern._sub_indices[sub]
+        arg = "%s(e[%s])" % (meta(pattern.core[pos].name + "~replace"),
+                             _offset('p', pos))
+        for wrapper in wrappers:
+            arg = "%s(%s)" % (meta(wrapper), arg)
+        args.append(arg)
+
+    first = _offset('p', pattern.insets[0])
+    last = _offset('p', length + pattern.insets[1])
+    lines.append("    start = 0")
+    lines.append("    while True:")
+    lines.append("        n = len(e)")
+    lines.append("        if n < %d:" % length)
+    lines.append("            return")
+    if pattern.anchored_end:
+        lines.append("        start = max(start, n - %d)" % length)
+    if pattern.offset:
+        lines.append("        if start > 0:")
+        lines.append("            return")
+        lines.append("        stop = 1")
+    else:
+        lines.append("        stop = %s" % _offset('n', 1 - length))
+    lines.append("        for p in xrange(start, stop):")
+    lines.append("            if %s:" % ' and '.join(conditions))
+    lines.append("                break")
+    lines.append("        else:")
+    lines.append("            return")
+    lines.append("        element = %r.format(%s)" % (body.format_str,
+                                                      ', '.join(args)))
+    lines.append("        e[%s:%s] = [element]" % (first, last))
+    lines.append("        yield (%s, %s), element" % (first, last))
+    lines.append("        start = max(0, %s)"
+                 % _offset('p', pattern.insets[0] - length + 1))
@@ -0,0 +1,97 @@
+"""On-disk cache of compiled language definitions
+
+Compiling a language means turning its rules into a RuleTable and its list
+passes into listparse parsers. The result is pickled into a file in the cache
+directory along with a digest of the language module's source. When the
+Speller is created again, it loads the compiled definitions from that file
+instead of parsing the rules and templates anew. If the module's source has
+changed since the file was written, or the file was written by an incompatible
+version of numspell, the file is considered stale and gets rebuilt.
+
+"""
+
+__all__ = ['cache_path', 'source_digest', 'load', 'store', 'write_atomic']
+
+
+import cPickle as pickle
+import hashlib
+import os
+import sys
+import tempfile
+
+
+# Bump this whenever the layout of the compiled objects changes
+CACHE_VERSION = 4
+
+_version_key = (CACHE_VERSION, sys.version_info[:2])
+
+
+def cache_path(cache_dir, lang):
+    """Return the path of the cache file for the language code"""
+    return os.path.join(cache_dir, "spelling_%s.v%d.cache" % (lang, CACHE_VERSION))
+
+def source_digest(module):
+    """Return the SHA-1 hex digest of the module's source file"""
+    filename = module.__file__
+    if filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+    with open(filename, 'rb') as file_:
+        return hashlib.sha1(file_.read()).hexdigest()
+
+def load(path, digest):
+    """Return the compiled definitions stored in path
+
+    Return None if there is no such file, it cannot be read or is stale.
+
+    """
+    try:
+        with open(path, 'rb') as file_:
+            version_key, file_digest, payload = pickle.load(file_)
+    except Exception:
+        return
+    if version_key != _version_key or file_digest != digest:
+        return
+    return payload
+
+def store(path, digest, payload):
+    """Write the compiled definitions to path
+
+    The file is written with write_atomic(). Return False if it could not be
+    written.
+
+    """
+    directory = os.path.dirname(path)
+    def write(file_):
+        pickle.dump((_version_key, digest, payload), file_,
+                    pickle.HIGHEST_PROTOCOL)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write_atomic(path, write, 0o644)
+    except (IOError, OSError, pickle.PicklingError):
+        return False
+    return True
+
+def write_atomic(path, write, mode):
+    """Create or replace the file at path with the given permission mode
+
+    write is called with a file object open for writing in binary mode. The
+    data goes to a temporary file in the same directory, which is then
+    renamed to path, so that concurrent readers never see a partially
+    written file. Exceptions are propagated after removing the temporary
+    file.
+
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as file_:
+            write(file_)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -5,12 +5,16 @@ dictionary to the constructor. Then use its 'sub' method to replace groups of
 elements of a list with one new element obtained by substituting values of the
 elements into the template string.
 
+A compiled parser is not modified by matching: the matched elements are kept
+in the Match returned by each search. One parser can therefore be used by
+several threads at once.
+
 To learn more about the template string syntax, take a look at the file
 Template-Syntax.md in the 'doc' directory.
 
 """
 
-__all__ = ['Range', 'Parser']
+__all__ = ['Range', 'Match', 'Parser']
 
 
 import re
@@ -28,6 +32,9 @@ class Range(object):
     'span' is a two-element tuple: (start, end).
 
     """
+
+    __slots__ = ('_start', '_end', '_span')
+
     def __init__(self, start, length):
         self._start = start
         self._end = start + length
@@ -47,6 +54,34 @@ class Range(object):
     span = property(_get_span)
 
 
+class Match(Range):
+    """The range of a matching sequence along with the matched elements
+
+    'subs' is a list of Groups, one per substitution token of the pattern.
+
+    """
+
+    __slots__ = ('subs',)
+
+    def __init__(self, start, length, subs):
+        Range.__init__(self, start, length)
+        self.subs = subs
+
+
+class Group(object):
+    """An element matched by a matcher token
+
+    It has the 'name' of the token and the matched element as 'value'.
+
+    """
+
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
 class Parser(object):
     """List processor for element replacement
 
@@ -59,6 +94,10 @@ class Parser(object):
 
     The 'sub' method is used to substitute elements in a list.
 
+    Parsers can be pickled. The functions from the dictionary are not saved,
+    so an unpickled parser has to be given the dictionary again by calling
+    its 'bind' method before it can be used.
+
     """
 
     def __init__(self, template, meta=None):
@@ -73,12 +112,24 @@ class Parser(object):
         """
         pattern_str, body_str = [x.strip() for x in template.split('=')]
 
+        self.template = template
         self.meta = meta or {}
         self.pattern = Pattern(pattern_str, self.meta)
         self.body = Body(body_str, self.meta)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['meta']
+        return state
+
+    def bind(self, meta):
+        """Look up the functions used by the template in meta"""
+        self.meta = meta or {}
+        self.pattern.bind(self.meta)
+        self.body.bind(self.meta)
+
     def search(self, list_):
-        """Return a Range of the first matching sequence in list_"""
+        """Return a Match of the first matching sequence in list_"""
         return self.pattern.search(list_)
 
     def sub(self, list_):
@@ -93,55 +144,101 @@ class Parser(object):
 
         """
         result = list_[:]
-        ranges = []
+        ranges = [sub_range for sub_range, _ in self.isub(result)]
+        return result, ranges
+
+    def isub(self, list_):
+        """Perform substitution on the given list in place
+
+        This is a generator version of 'sub'. After each substitution it
+        yields a two-element tuple: the range of replaced elements (start,
+        end) and the new element that has replaced them.
+
+        """
+        start = 0
         while True:
-            m = self.search(result)
+            m = self.pattern.search(list_, start)
             if not m:
                 break
 
             sub_range = (m.start + self.pattern.insets[0],
                          m.end + self.pattern.insets[1])
-            result[slice(*sub_range)] = [self.body.format(self.pattern.subs)]
-            ranges.append(sub_range)
-        return result, ranges
+            element = self.body.format(m.subs)
+            list_[slice(*sub_range)] = [element]
+            yield sub_range, element
+
+            # Only the sequences overlapping the new element might have
+            # started matching after the substitution. Those preceding it
+            # have already been checked.
+            start = max(0, sub_range[0] - self.pattern.length + 1)
 
 
 class Pattern(object):
-    """Encapsulates a list of tokens for matching"""
+    """Encapsulates a list of tokens for matching
+
+    The pattern is matched by simulating a nondeterministic automaton with one
+    state per token. The set of active states is kept in an integer bit mask:
+    bit k is set when the last k + 1 elements seen match the first k + 1
+    tokens. Each element of the list is examined exactly once, so the search
+    is linear in the length of the list and allocates nothing per element.
+
+    """
 
     def __init__(self, pattern, meta):
         self.tokens = []        # tokens to match against
-        self.subs = []          # substitutions (tokens with values)
+        self.subs = []          # substitutions (matcher tokens)
         self.offset = 0         # will be set to 1 if pattern has the ^ anchor
         self.insets = (0, 0)    # a bias applied to the range of substitution
         self.length = 0
         self._build(pattern, meta)
 
-    def padded_list(self, index, length):
-        """Return a list of tokens padded with None values at the beginning"""
-        start_index = max(0, self.offset - index)
-        new_list = [None] * (index - self.offset) + self.tokens[start_index:]
-        return new_list[:length]
-
-    def search(self, list_):
+    def search(self, list_, start=0):
         """Search for a sequence of elements matching the pattern
 
-        Return a Range of the first sequence of matching elements.
+        Return a Match of the first sequence of matching elements which starts
+        at index 'start' or later.
 
         """
         list_len = len(list_)
         pattern_len = self.length
-        if list_len < pattern_len:
+        if list_len < pattern_len or not pattern_len:
             return
 
-        # Run through list_ looking for a matching sequence of elements
-        cmp_fn = lambda token, x: (token is None) or token.matches(x)
-        for i in range(list_len - pattern_len + 1):
-            if all(map(cmp_fn, self.padded_list(i, list_len), list_)):
-                return Range(i, pattern_len)
+        stop = list_len
+        if self.anchored_end:
+            start = max(start, list_len - pattern_len)
+        if self.offset:
+            if start > 0:
+                return
+            stop = min(stop, pattern_len)
+
+        literal_masks = self._literal_masks
+        matchers = self._matchers
+        final = 1 << (pattern_len - 1)
+        init = 1
+        state = 0
+        for i in xrange(start, stop):
+            x = list_[i]
+            active = (state << 1) | init
+            state = active & literal_masks.get(x, 0)
+            for bit, fn in matchers:
+                if active & bit and fn(x):
+                    state |= bit
+            if state & final:
+                begin = i - pattern_len + 1
+                return Match(begin, pattern_len,
+                             self.groups(list_[begin:i+1]))
+            if self.offset:
+                # Only a sequence starting at index 0 can match
+                init = 0
+
+    def groups(self, elements):
+        """Return the Groups of the elements matched by the core tokens"""
+        return [Group(self.core[index].name, elements[index])
+                for index in self._sub_indices]
 
     def _build(self, pattern, meta):
-        """Build the 'tokens' and 'subs' lists"""
+        """Build the 'tokens' and 'subs' lists and the matching automaton"""
         elements = re.split(r'\s+', pattern)
         insets = [0, 0]
         left_side = True
@@ -164,20 +261,43 @@ class Pattern(object):
         right_offset = int(elements[-1] == '$')
         self.length = len(self.tokens) - self.offset - right_offset
         self.insets = tuple(insets)
+        self.anchored_end = bool(right_offset)
+
+        # Literal tokens are looked up by the element value, matcher tokens
+        # are tried one by one
+        self.core = self.tokens[self.offset:self.offset+self.length]
+        self._literal_masks = {}
+        for index, token in enumerate(self.core):
+            if type(token) is LiteralToken:
+                masks = self._literal_masks
+                masks[token.string] = masks.get(token.string, 0) | (1 << index)
+        self._sub_indices = [self.core.index(token) for token in self.subs]
+        self._bind_matchers()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_matchers']
+        return state
+
+    def bind(self, meta):
+        """Look up the functions of matcher tokens in meta"""
+        for token in self.tokens:
+            if type(token) is MatcherToken:
+                token.bind(meta)
+        self._bind_matchers()
+
+    def _bind_matchers(self):
+        self._matchers = [(1 << index, token.fn)
+                          for index, token in enumerate(self.core)
+                          if type(token) is MatcherToken]
 
 
 class Body(object):
     """The body defines a replacement for a matching sequence of elements"""
     def __init__(self, body, meta):
-        def wrap_fn(wrapper, fn):
-            return lambda x: wrapper(fn(x))
-
         def repl_fn(match):
-            fn = lambda token: meta[token.name + "~replace"](token.value)
             wrappers = match.group(1).split(':')
-            for w in wrappers[1:]:
-                fn = wrap_fn(meta[w], fn)
-            self.format_list.append(fn)
+            self.format_wrappers.append(wrappers[1:])
 
             index_str = wrappers[0]
             if index_str:
@@ -188,15 +308,43 @@ class Body(object):
             return "{}"
 
         # Here we look at each substitution token enclosed in { and }. Inside
-        # repl_fn, we gather all of the modifiers into a single function using
-        # wrap_fn. Then this function is appended to the format_list.
-        self.format_list = []
+        # repl_fn, we gather the names of all of its modifiers. Then bind
+        # turns them into functions.
+        self.format_wrappers = []
         self.format_indices = []
         self.format_str = re.sub(r'{(.*?)}', repl_fn, body)
+        self.bind(meta)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['format_list']
+        return state
+
+    def bind(self, meta):
+        """Build the format_list using the functions from meta
+
+        For each substitution, all of its modifiers are gathered into a single
+        function using wrap_fn. Then this function is appended to the
+        format_list.
+
+        """
+        def wrap_fn(wrapper, fn):
+            return lambda x: wrapper(fn(x))
 
-    def format(self, tokens):
-        """Returns a final string after substituting token values"""
-        mapped_tokens = map(lambda i: tokens[i], self.format_indices)
+        self.format_list = []
+        for wrappers in self.format_wrappers:
+            fn = lambda token: meta[token.name + "~replace"](token.value)
+            for w in wrappers:
+                fn = wrap_fn(meta[w], fn)
+            self.format_list.append(fn)
+
+    def format(self, groups):
+        """Returns a final string after substituting the matched values
+
+        groups is the 'subs' list of a Match.
+
+        """
+        mapped_tokens = map(lambda i: groups[i], self.format_indices)
         format_args = [f(x) for f, x in zip(self.format_list, mapped_tokens)]
         return self.format_str.format(*format_args)
 
@@ -207,12 +355,18 @@ class AnchorToken(object):
     This token is represented by ^ and $ symbols in the template string syntax.
 
     """
+
+    __slots__ = ()
+
     def matches(self, _):
         return False
 
 
 class LiteralToken(object):
     """Literal token simply matches the string it is given"""
+
+    __slots__ = ('string',)
+
     def __init__(self, string):
         self.string = string
 
@@ -221,18 +375,24 @@ class LiteralToken(object):
 
 
 class MatcherToken(object):
-    """Matcher token uses a function to match against an element
+    """Matcher token uses a function to match against an element"""
 
-    It also stores the value of the element it matches
+    __slots__ = ('fn', 'name')
 
-    """
     def __init__(self, fn, name):
         self.fn = fn
         self.name = name
-        self.value = None
+
+    def __getstate__(self):
+        return {'name': self.name}
+
+    def __setstate__(self, state):
+        self.name = state['name']
+
+    def bind(self, meta):
+        self.fn = meta[self.name + "~find"]
 
     def matches(self, obj):
-        self.value = obj
         return self.fn(obj)
 
 
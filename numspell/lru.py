@@ -0,0 +1,111 @@
+"""A bounded mapping with least-recently-used eviction
+
+The Speller uses it to memoize number decompositions and final spellings.
+
+"""
+
+__all__ = ['LRUCache', 'CacheInfo']
+
+
+from collections import namedtuple
+import threading
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses capacity size')
+
+# Indices of the fields in each link of the circular list
+PREV, NEXT, KEY, VALUE = range(4)
+
+
+class LRUCache(object):
+    """A dictionary-like container with a fixed capacity
+
+    When the cache is full, storing a new key evicts the least recently used
+    one. Every lookup updates the 'hits' or 'misses' counter. A cache with a
+    capacity of 0 stores nothing.
+
+    Entries are kept in a circular doubly linked list of [prev, next, key,
+    value] links, with the most recently used entry right before the root.
+    The list is only modified while holding a lock, so a cache can be shared
+    by several threads.
+
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._map = {}
+        self._lock = threading.Lock()
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def get(self, key, default=None):
+        """Return the value stored for key or default if there is none"""
+        with self._lock:
+            link = self._map.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+
+            self._touch(link)
+            self.hits += 1
+            return link[VALUE]
+
+    def put(self, key, value):
+        """Store value under key, evicting the oldest entry if necessary"""
+        if self.capacity <= 0:
+            return
+
+        with self._lock:
+            link = self._map.get(key)
+            if link is not None:
+                link[VALUE] = value
+                self._touch(link)
+                return
+
+            root = self._root
+            if len(self._map) >= self.capacity:
+                # Reuse the oldest link for the new entry
+                oldest = root[NEXT]
+                del self._map[oldest[KEY]]
+                oldest[PREV][NEXT] = oldest[NEXT]
+                oldest[NEXT][PREV] = oldest[PREV]
+
+            last = root[PREV]
+            link = [last, root, key, value]
+            last[NEXT] = root[PREV] = self._map[key] = link
+
+    def _touch(self, link):
+        """Move the link to the most recently used position
+
+        Must be called while holding the lock.
+
+        """
+        link_prev, link_next = link[PREV], link[NEXT]
+        link_prev[NEXT] = link_next
+        link_next[PREV] = link_prev
+        root = self._root
+        last = root[PREV]
+        last[NEXT] = root[PREV] = link
+        link[PREV] = last
+        link[NEXT] = root
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._map.clear()
+            self._root[:] = [self._root, self._root, None, None]
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Return a CacheInfo tuple with the cache statistics"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.capacity,
+                             len(self._map))
@@ -1,19 +1,33 @@
 """numspell -- a module for spelling integers"""
 
+import array
+import functools
 import logging
+import operator
+import os
 import re
+from timeit import default_timer
 
+import langcache
 import listparse
+import reverse
+from lru import LRUCache
 from squash import squash
+from table import SpellingTable, load as load_table
 from spelling import isnum, isorder
+from tracing import PassResult, RuleMatch, Trace
 
 
-def setup_logging(debug):
-    if debug:
-        log_level = logging.DEBUG
-    else:
-        log_level = logging.WARNING
-    logging.basicConfig(format="*** %(message)s", level=log_level)
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Sub-numbers up to this many digits have their decompositions memoized
+MEMO_MAX_DIGITS = 24
+
+def setup_logging():
+    logging.basicConfig(format="*** %(message)s", level=logging.DEBUG)
+
+def log_trace(trace):
+    logging.debug("%s\n", trace.format())
 
 def load_lang_module(lang):
     spelling_mod = "spelling_" + lang
@@ -25,24 +39,181 @@ def to_list(list_or_str):
         return [x.strip() for x in list_or_str.splitlines() if x]
     return list_or_str
 
+def renumber_orders(tokens):
+    """Number the orders in tokens from right to left starting with 1"""
+    order = 0
+    for i in range(len(tokens)-1, -1, -1):
+        if isorder(tokens[i]):
+            order += 1
+            tokens[i] = order
+
+def renumber_squash(tokens):
+    """Renumber the orders in tokens and squash them, in place
+
+    Same as renumber_orders(tokens) followed by squash(isorder, tokens), only
+    done in one pass without building a new list.
+
+    """
+    order = 0
+    for x in tokens:
+        if type(x) is int:
+            order += 1
+    if not order:
+        return
+
+    # Each order is numbered before it is squashed, so the one kept from a
+    # run gets the highest number of the run
+    write = 0
+    run_end = None      # where the last order of the current run was written
+    for x in tokens:
+        if type(x) is int:
+            if run_end is not None:
+                # Drop the whitespace in between along with the order
+                write = run_end
+            else:
+                tokens[write] = order
+                write += 1
+                run_end = write
+            order -= 1
+            continue
+        if run_end is not None and x and not x.isspace():
+            run_end = None
+        tokens[write] = x
+        write += 1
+    del tokens[write:]
+
+def to_digits(num):
+    """Return the decimal digits of num with leading zeros stripped
+
+    num may be a non-negative integer, including any object with an
+    __index__ method such as NumPy integers but not a bool, or a string of
+    ASCII digits, either a byte string or a unicode one. Zero is returned as
+    an empty string. Raise ValueError for anything else.
+
+    """
+    if type(num) is bool:
+        raise ValueError("Not a number: %r" % num)
+    if not isinstance(num, (int, long, basestring)):
+        try:
+            num = operator.index(num)
+        except TypeError:
+            raise ValueError("Not a number: %r" % (num,))
+    if isinstance(num, (int, long)):
+        if num < 0:
+            raise ValueError("Cannot spell a negative number: %d" % num)
+        return num and str(num) or ''
+    if isinstance(num, unicode):
+        try:
+            num = num.encode('ascii')
+        except UnicodeError:
+            raise ValueError("Not a number: %r" % num)
+    if type(num) is not str or not num.isdigit():
+        raise ValueError("Not a number: %r" % (num,))
+    return num.lstrip('0')
+
+def join_words(words):
+    """Join words into a string with single spaces between them"""
+    result = ''.join(words).rstrip()
+    return WHITESPACE_RE.sub(' ', result)
+
+def iter_words(parts):
+    """Generate the words which join_words(parts) would separate by spaces"""
+    word = []
+    space = False
+    for part in parts:
+        for index, piece in enumerate(WHITESPACE_RE.split(part)):
+            if index:
+                space = True
+            if not piece:
+                continue
+            if space:
+                yield ''.join(word)
+                word = []
+                space = False
+            word.append(piece)
+    if word:
+        yield ''.join(word)
+
+def words_match(words, text):
+    """Return True if text consists of words separated by single spaces
+
+    Stops at the first word which does not match.
+
+    """
+    pos = 0
+    for word in words:
+        if not text.startswith(word, pos):
+            return False
+        pos += len(word)
+        if pos < len(text) and text[pos] != ' ':
+            return False
+        pos += 1
+    if not pos:
+        return not text
+    return pos == len(text) + 1
+
 
 class Speller(object):
     """The class which implements the number spelling"""
 
-    def __init__(self, lang="en", debug=False):
+    def __init__(self, lang="en", debug=False, cache_size=1024,
+                 cache_dir=None, stats=False, trace_every=0, trace_sink=None,
+                 table_range=None, table_path=None, codegen=False,
+                 pass_backend='list'):
         """Initialize the Speller instance with a language code
 
         Arguments
-            lang  -- language code in ISO 639-1 format
-            debug -- if True then print debug info to stderr
+            lang        -- language code in ISO 639-1 format
+            debug       -- if True then print the trace of every computed
+                           spelling to stderr
+            cache_size  -- how many decompositions and how many spellings to
+                           memoize; 0 disables memoization
+            cache_dir   -- directory for the cache of compiled language
+                           definitions; defaults to the NUMSPELL_CACHE_DIR
+                           environment variable. If neither is set, the
+                           definitions are compiled every time.
+            stats       -- if True then collect timings and counters that can
+                           be obtained with the stats() method
+            trace_every -- trace one in this many computed spellings and pass
+                           the Trace to trace_sink; 0 disables sampling
+            trace_sink  -- function of one argument receiving sampled traces;
+                           by default they are logged at the DEBUG level
+            table_range -- a (start, stop) tuple; if given, the spellings of
+                           all numbers in range(start, stop) are computed
+                           right away and kept in a SpellingTable, which is
+                           available as the 'table' attribute
+            table_path  -- file with a table built by 'spellnum build-table';
+                           it is mapped into memory instead of building one.
+                           A table which does not match the language module
+                           is ignored with a warning.
+            codegen     -- if True then run Python code generated for the
+                           rules and passes of the language instead of
+                           interpreting them; see numspell.codegen. The
+                           spellings are the same either way.
+            pass_backend -- 'list' to apply the list passes to the list of
+                           components or 'regex' to apply them to the
+                           components serialized into a string with
+                           regular expressions; see numspell.regexpass.
+                           The spellings are the same either way.
 
         """
-        setup_logging(debug)
+        if debug:
+            setup_logging()
+            trace_every = 1
 
+        self.lang = lang
+        self._options = {'cache_size': cache_size, 'cache_dir': cache_dir,
+                         'codegen': codegen, 'pass_backend': pass_backend}
         module = load_lang_module(lang)
-        self.RULES = [rule_from_str(x) for x in to_list(module.RULES)]
         self.NUMBERS = module.NUMBERS
         self.ORDERS = module.ORDERS
+        # Digit strings of the numbers, interned, and the words of numbers
+        # and orders keyed by the components standing for them
+        self._number_strs = dict((str(x), intern(str(x)))
+                                 for x in self.NUMBERS)
+        self._words = dict((self._number_strs[str(x)], word)
+                           for x, word in self.NUMBERS.items())
+        self._words.update(enumerate(self.ORDERS))
         if hasattr(module, 'LIST_PASS'):
             self.PASSES = to_list(module.LIST_PASS['passes'])
             self.META = module.LIST_PASS['meta']
@@ -50,44 +221,411 @@ class Speller(object):
             self.PASSES = []
             self.META = {}
 
+        if cache_dir is None:
+            cache_dir = os.environ.get('NUMSPELL_CACHE_DIR')
+        if cache_dir:
+            self._load_compiled(module, lang, cache_dir)
+        else:
+            self._compile(module)
+
+        self._parse_cache = LRUCache(cache_size)
+        self._spell_cache = LRUCache(cache_size)
+        self._word_index = None
+
+        self._generated = None
+        if codegen:
+            import codegen as generator
+            self._generated = generator.load(self, module, cache_dir)
+            self._components = self._components_generated
+
+        if pass_backend == 'regex':
+            import regexpass
+            self._apply_passes = regexpass.RegexPasses(self._parsers,
+                                                       self.META).apply
+        elif pass_backend == 'list':
+            parsers = self._generated and self._generated.passes
+            self._apply_passes = functools.partial(
+                    apply_parsers, parsers=parsers or self._parsers)
+        else:
+            raise ValueError("Unknown pass backend: %s" % pass_backend)
+
+        # Spellings are looked up in the table first, then in the cache
+        self._instrumented = False
+        self._stats = None
+        self._cached = self._spell_cache.get
+        self.table = None
+        if table_path is not None:
+            try:
+                self.table = load_table(table_path, lang,
+                                        langcache.source_digest(module))
+            except ValueError as e:
+                logging.warning("Ignoring the spelling table: %s", e)
+        if self.table is None and table_range is not None:
+            self.table = SpellingTable.build(self, *table_range)
+        if self.table is not None:
+            self._cached = self.table.chain(self._cached)
+
+        # Instrumented spellers take the regular path for every number
+        self._instrumented = bool(stats or trace_every)
+        if stats:
+            self._stats = Stats(self.RULES, self._parsers)
+            self._spell = self._spell_instrumented
+
+        if trace_every:
+            self._trace_every = self._trace_countdown = trace_every
+            self._trace_sink = trace_sink or log_trace
+            self._spell_unsampled = self._spell
+            self._spell = self._spell_sampled
+
     def spell(self, num):
         """Return the spelling of the given integer
 
         Arguments:
-          num   -- number to spell
+          num   -- number to spell; either an integer or a string of decimal
+                   digits, which spares the conversion of huge integers
 
         Return value:
           A string with num's spelling.
 
         """
+        result = self._cached(num)
+        if result is None:
+            result = self._spell(num)
+            self._spell_cache.put(num, result)
+        return result
+
+    def spell_many(self, nums, pairs=False):
+        """Generate spellings for each integer in an iterable
+
+        Spellings are produced lazily, one at a time, so nums can be of any
+        length, e.g. a generator reading numbers from a file. The setup
+        spell() performs on every call is only done once per batch.
+
+        Arguments:
+          nums   -- iterable of numbers to spell
+          pairs  -- if True then yield (num, spelling) tuples instead of
+                    plain spellings
+
+        """
+        cache_get = self._cached
+        cache_put = self._spell_cache.put
+        spell = self._spell
+        for num in nums:
+            result = cache_get(num)
+            if result is None:
+                result = spell(num)
+                cache_put(num, result)
+            if pairs:
+                yield num, result
+            else:
+                yield result
+
+    def spell_iter(self, num):
+        """Generate the words of num's spelling one at a time
+
+        The words are produced from the final components without joining
+        them into one string first, so the spelling of a huge number can be
+        written out piecewise. ' '.join(spell_iter(num)) equals spell(num).
+        Computed spellings are not stored in the spelling cache.
+
+        """
+        result = self._cached(num)
+        if result is not None:
+            for word in result.split(' '):
+                yield word
+            return
+
+        numstr = to_digits(num)
+        if not numstr:
+            yield self.NUMBERS[0]
+            return
+        for word in iter_words(self._components(numstr)):
+            yield word
+
+    def spell_range(self, start, stop, step=1, pairs=False):
+        """Generate spellings for each integer in range(start, stop, step)
+
+        Consecutive numbers which only differ in the lowest group of digits,
+        the one split off by the language's consuming rule, share the
+        decomposition of the higher groups and the effect of the list passes
+        on it. Those are computed once per block of such numbers, and only
+        the lowest group is processed for each number. The spellings are the
+        same as those returned by spell(). The spelling cache is bypassed.
+
+        Arguments:
+          start, stop, step -- same as for range(); integers of any size
+          pairs             -- if True then yield (num, spelling) tuples
+                               instead of plain spellings
+
+        """
+        if step == 0:
+            raise ValueError("spell_range() step must not be zero")
+        if step > 0:
+            count = (stop - start + step - 1) // step
+        else:
+            count = (start - stop - step - 1) // -step
+        if count > 0:
+            # The smallest number of the range must be spellable
+            to_digits(min(start, start + (count - 1) * step))
+
+        digits = not self._instrumented and self._group_digits()
+        group = digits and 10 ** digits
+        num = start
+        while (step > 0 and num < stop) or (step < 0 and num > stop):
+            if group:
+                prefix, low = divmod(num, group)
+                if step > 0:
+                    end = min(stop, (prefix + 1) * group)
+                else:
+                    end = max(stop, prefix * group - 1)
+            if group and prefix and (end - num) // step > 1:
+                block = RangeBlock(self, str(prefix), digits)
+            else:
+                block = None
+                end = num + step
+
+            while (step > 0 and num < end) or (step < 0 and num > end):
+                result = None
+                if block is not None and block.valid:
+                    result = block.spell(num - prefix * group)
+                if result is None:
+                    result = self._spell(num)
+                if pairs:
+                    yield num, result
+                else:
+                    yield result
+                num += step
+
+    def spell_parallel(self, nums, processes=None, chunk_size=1000,
+                       pairs=False):
+        """Generate spellings for each integer in nums using several processes
+
+        Each worker process builds its own Speller with the same language and
+        options as this one. The spellings are yielded in the order of nums.
+        See numspell.parallel.spell_parallel for the meaning of arguments.
+
+        """
+        import parallel
+        return parallel.spell_parallel(nums, self.lang, processes, chunk_size,
+                                       pairs, **self._options)
+
+    def spell_array(self, array, as_buffer=False):
+        """Return the spellings of the integers in a NumPy array
+
+        The result is an array of objects with the same shape holding the
+        spelling of each element, as returned by spell(). Equal numbers are
+        spelled once. Requires NumPy; see numspell.arrays.spell_array for
+        the meaning of arguments.
+
+        """
+        import arrays
+        return arrays.spell_array(self, array, as_buffer)
+
+    def spell_trace(self, num):
+        """Spell the number and record every step taken
+
+        The memoization caches are bypassed, so that the trace is complete.
+
+        Return value:
+          A numspell.tracing.Trace object. Its 'result' attribute holds the
+          spelling.
+
+        """
+        trace = Trace(num)
+        numstr = to_digits(num)
+        if not numstr:
+            trace.result = self.NUMBERS[0]
+            return trace
+
+        tokens = self._decompose_traced(numstr, trace.rules)
+        trace.decomposition = tokens[:]
+        renumber_orders(tokens)
+        trace.renumbered = tokens[:]
+        tokens = squash(isorder, tokens)
+        trace.squashed = tokens[:]
+        tokens = apply_parsers(tokens, self._parsers, trace=trace.passes)
+        self._lookup_words(tokens)
+        trace.components = tokens
+        trace.result = join_words(tokens)
+        return trace
 
-        if num == 0:
+    def cache_info(self):
+        """Return statistics of the memoization caches
+
+        Return value:
+          A dict with 'decomposition' and 'spelling' keys. Each value is a
+          CacheInfo tuple with hits, misses, capacity and size fields.
+
+        """
+        return {
+            'decomposition': self._parse_cache.info(),
+            'spelling': self._spell_cache.info(),
+        }
+
+    def cache_clear(self):
+        """Empty the memoization caches and reset their statistics"""
+        self._parse_cache.clear()
+        self._spell_cache.clear()
+
+    def stats(self):
+        """Return the timings and counters collected since the last reset
+
+        Return value:
+          None if the Speller was created with stats=False. Otherwise a dict
+          with the following keys:
+
+            spelled  -- number of spellings computed; spell() calls served
+                        from the spelling cache are not included
+            stages   -- dict mapping each stage of the algorithm to a dict
+                        with its total wall 'time' in seconds and 'calls'
+            rules    -- dict mapping each rule to the number of times it was
+                        applied; memoized decompositions and those made by
+                        generated code (codegen=True) are not included
+            passes   -- dict mapping each pass template to the number of
+                        substitutions it has made
+
+        """
+        if self._stats is not None:
+            return self._stats.snapshot()
+
+    def reset_stats(self):
+        """Reset the timings and counters returned by stats()"""
+        if self._stats is not None:
+            self._stats.reset()
+
+    def _compile(self, module):
+        """Compile the rules and passes of the language module"""
+        self.RULES = [rule_from_str(x) for x in to_list(module.RULES)]
+        self._rule_table = RuleTable(self.RULES)
+        self._parsers = [listparse.Parser(x, self.META) for x in self.PASSES]
+
+    def _load_compiled(self, module, lang, cache_dir):
+        """Load compiled definitions from the cache, rebuilding it if stale"""
+        path = langcache.cache_path(cache_dir, lang)
+        digest = langcache.source_digest(module)
+        compiled = langcache.load(path, digest)
+        if compiled is None:
+            self._compile(module)
+            compiled = (self.RULES, self._rule_table, self._parsers)
+            if not langcache.store(path, digest, compiled):
+                logging.warning("Could not write the cache file %s", path)
+            return
+
+        self.RULES, self._rule_table, self._parsers = compiled
+        for parser in self._parsers:
+            parser.bind(self.META)
+
+    def _spell(self, num):
+        """Spell num bypassing the spelling cache"""
+        numstr = to_digits(num)
+        if not numstr:
             return self.NUMBERS[0]
 
+        # Finally, squash any sequence of whitespace into a single space
+        return join_words(self._components(numstr))
+
+    def _components(self, numstr):
+        """Return the spelled out components of a non-zero digit string"""
         # *** Pass 1. Apply rules to decompose the number ***
-        tokens = self._parse_num(num)
-        # Renumber orders
-        order = 0
-        for i in range(len(tokens)-1, -1, -1):
-            if isorder(tokens[i]):
-                order += 1
-                tokens[i] = order
-        tokens = squash(isorder, tokens)
-        logging.debug("Number decomposition:\n    %s\n", tokens)
+        tokens = self._decompose(numstr)
+        renumber_squash(tokens)
 
         # *** Pass 2. Apply list transformations ***
-        processed_tokens = apply_passes(tokens, self.PASSES, self.META)
-        for index, token in enumerate(processed_tokens):
-            if isnum(token):
-                processed_tokens[index] = self.NUMBERS[int(token)]
-            elif isorder(token):
-                processed_tokens[index] = self.ORDERS[token]
-        result = ''.join(processed_tokens).rstrip()
+        self._apply_passes(tokens)
+        self._lookup_words(tokens)
+        return tokens
+
+    def _components_generated(self, numstr):
+        """Same as _components but runs the code generated for the language"""
+        tokens = self._decompose_generated(numstr)
+        renumber_squash(tokens)
+        self._apply_passes(tokens)
+        self._lookup_words(tokens)
+        return tokens
+
+    def _decompose_generated(self, numstr):
+        """Same as _decompose but runs the code generated for the language"""
+        generated = self._generated
+        if len(numstr) > generated.max_digits:
+            return self._decompose(numstr)
+        tokens = []
+        generated.decompose(numstr, 0, len(numstr), tokens)
+        return tokens
+
+    def _spell_instrumented(self, num):
+        """Same as _spell but also collects stats on every stage
+
+        The stages are timed around the same calls _components makes.
+
+        """
+        stats = self._stats
+        stats.spelled += 1
+        if self._generated is not None:
+            decompose = self._decompose_generated
+        else:
+            decompose = self._decompose
+        t0 = default_timer()
+        numstr = to_digits(num)
+        if not numstr:
+            return self.NUMBERS[0]
+        tokens = decompose(numstr)
+        t1 = default_timer()
+        renumber_squash(tokens)
+        t2 = default_timer()
+        self._apply_passes(tokens, hits=stats.pass_hits)
+        t3 = default_timer()
+        self._lookup_words(tokens)
+        t4 = default_timer()
+        result = join_words(tokens)
+        t5 = default_timer()
+
+        stats.add_timings((t0, t1, t2, t3, t4, t5))
+        return result
 
-        logging.debug("Final components:\n    %s\n", processed_tokens)
+    def _spell_sampled(self, num):
+        """Same as _spell but traces one in every trace_every calls
 
-        # Finally, squash any sequence of whitespace into a single space
-        return re.sub(r'\s+', ' ', result)
+        The spelling returned is always computed by the regular path, the
+        trace only records it.
+
+        """
+        self._trace_countdown -= 1
+        if self._trace_countdown:
+            return self._spell_unsampled(num)
+
+        self._trace_countdown = self._trace_every
+        result = self._spell_unsampled(num)
+        self._trace_sink(self.spell_trace(num))
+        return result
+
+    def _group_digits(self):
+        """Return how many digits the consuming rule splits off, or None"""
+        for rule in self.RULES:
+            if isinstance(rule, RecursiveRule):
+                return rule._chopped_len()
+
+    def _lookup_words(self, tokens):
+        """Replace numbers and orders in tokens with their spelling"""
+        words = self._words
+        for index, x in enumerate(tokens):
+            if x in words:
+                tokens[index] = words[x]
+            elif type(x) is int:
+                raise IndexError("No word for the order %d" % x)
+
+    def parse(self, text):
+        """Return the integer spelled in text
+
+        The text is split into the words the Speller uses, which need not be
+        separated by whitespace, and their values are added up. The text is
+        not validated: use check(parse(text), text) for that.
+
+        Raise ValueError if the text contains unknown words.
+
+        """
+        if self._word_index is None:
+            self._word_index = reverse.WordIndex(self)
+        return self._word_index.parse(text)
 
     def check(self, num, spelling):
         """Check if the given spelling is correct
@@ -106,38 +644,326 @@ class Speller(object):
             return
         return result
 
+    def check_many(self, pairs):
+        """Generate a (num, spelling, correct) tuple for each wrong spelling
+
+        Arguments:
+          pairs  -- iterable of (num, spelling) tuples
+
+        Correct pairs produce nothing. The spelling of each number is
+        compared to the given one word by word, stopping at the first
+        difference, and is only joined into a string if they differ.
+
+        """
+        cache_get = self._cached
+        for num, spelling in pairs:
+            result = cache_get(num)
+            if result is None and self._instrumented:
+                result = self._spell(num)
+            if result is not None:
+                if result != spelling:
+                    yield num, spelling, result
+                continue
+
+            numstr = to_digits(num)
+            if numstr:
+                parts = self._components(numstr)
+            else:
+                parts = [self.NUMBERS[0]]
+            if not words_match(iter_words(parts), spelling):
+                yield num, spelling, join_words(parts)
+
     def _parse_num(self, num):
-        """Decompose num into components using self.RULES"""
-        if num == 0:
-            return []
+        """Decompose num into components using self.RULES
 
-        numstr = str(num)
-        if num in self.NUMBERS:
-            return [numstr]
+        Returns a new list which the caller is free to modify.
+
+        """
+        return self._decompose(to_digits(num))
 
-        rule = first_match(numstr, self.RULES)
-        body = rule.body.replace('}', '},').replace('{', ',{')
-        components = body.split(',')
+    def _decompose(self, numstr):
+        """Decompose a digit string without leading zeros into components
 
-        logging.debug("Body components:\n    %s", components)
+        The rules are applied iteratively to windows of numstr, so neither
+        the length of numstr nor the nesting of consuming patterns is limited
+        by the recursion depth, and sub-numbers are never converted to
+        integers. Decompositions of sub-numbers no longer than
+        MEMO_MAX_DIGITS are memoized.
 
+        Returns a new list which the caller is free to modify.
+
+        """
         result = []
-        pattern = re.compile(r'{(.+?)}')
-        mapping = rule.bind(numstr)
-        for raw_token in components:
-            match = pattern.match(raw_token)
-            if not match:
-                result.append(raw_token)
+        memo = self._parse_cache
+        numbers = self._number_strs
+        lookup = self._rule_table.lookup
+        rule_hits = self._stats is not None and self._stats.rule_hits
+
+        # The stack holds what remains to be appended to result, topmost item
+        # first: components, (numstr, start, end) windows of digits still to
+        # be decomposed and (key, begin) markers telling to memoize
+        # result[begin:] under key.
+        stack = [(numstr, 0, len(numstr))]
+        while stack:
+            item = stack.pop()
+            if type(item) is not tuple:
+                result.append(item)
+                continue
+            if len(item) == 2:
+                key, begin = item
+                memo.put(key, result[begin:])
                 continue
 
-            token = match.group(1)
-            if token == '*':
-                result.append(0)
+            numstr, start, end = item
+            while start < end and numstr[start] == '0':
+                start += 1
+            if start == end:
+                continue
+            if end - start <= MEMO_MAX_DIGITS:
+                key = numstr[start:end]
+                number = numbers.get(key)
+                if number is not None:
+                    result.append(number)
+                    continue
+                tokens = memo.get(key)
+                if tokens is not None:
+                    result.extend(tokens)
+                    continue
+                stack.append((key, len(result)))
+
+            rule, plan = lookup(numstr, start, end)
+            if rule_hits:
+                rule_hits[rule] += 1
+            for kind, value in reversed(plan):
+                if kind == LITERAL:
+                    stack.append(value)
+                elif kind == ORDER:
+                    stack.append(0)
+                elif kind == SLICE:
+                    stack.append((numstr, start + value[0], start + value[1]))
+                else:
+                    new_numstr = ''.join([
+                            type(x) is str and x
+                            or numstr[start + x[0]:start + x[1]]
+                            for x in value])
+                    stack.append((new_numstr, 0, len(new_numstr)))
+        return result
+
+    def _decompose_traced(self, numstr, matches):
+        """Decompose numstr without memoization, appending RuleMatch to matches"""
+        if not numstr:
+            return []
+        if numstr in self._number_strs:
+            return [self._number_strs[numstr]]
+
+        rule, plan = self._rule_table.lookup(numstr)
+        matches.append(RuleMatch(numstr, "%s = %s" % (rule.pattern, rule.body),
+                                 rule.bind(numstr), rule.components))
+        return expand_plan(numstr, plan,
+                           lambda x: self._decompose_traced(x, matches))
+
+
+def expand_plan(numstr, plan, decompose):
+    """Return the components obtained by applying a rule's plan to numstr
+
+    Numbers in the rule body are decomposed by calling decompose with their
+    digits, leading zeros stripped.
+
+    """
+    result = []
+    for kind, value in plan:
+        if kind == LITERAL:
+            result.append(value)
+        elif kind == ORDER:
+            result.append(0)
+        elif kind == SLICE:
+            start, end = value
+            result.extend(decompose(numstr[start:end].lstrip('0')))
+        else:
+            new_numstr = ''.join([type(x) is str and x or numstr[x[0]:x[1]]
+                                  for x in value])
+            result.extend(decompose(new_numstr.lstrip('0')))
+    return result
+
+
+# Stands for the words that precede the lowest group in a RangeBlock
+GLUE = object()
+
+
+class RangeBlock(object):
+    """Spells numbers that share all digits but the lowest group
+
+    The components of a number are split into the head, obtained from the
+    common prefix, and the tail, obtained from the lowest group. The orders
+    are only found in the head, so renumbering and squashing it can be done
+    once. A list pass only affects the head the same way for every number if
+    its matches lie entirely within the head. Since the passes scan from left
+    to right, the ones which could overlap the tail start at most
+    pattern.length - 1 elements before it. Those elements are spilled from the
+    head into the tail before each pass is applied to the tail.
+
+    The numbers and orders, both of the head and the tail, are paired with
+    the lists of words following them up to the next number or order.
+    Replacing a range of them keeps the words of the last one, just like
+    apply_parsers does.
+
+    The 'valid' attribute is False if the rule applied to the prefix does not
+    split the number into a head and a tail.
+
+    """
+
+    def __init__(self, speller, prefix, digits):
+        self.speller = speller
+        self.valid = False
+
+        numstr = prefix + '0' * digits
+        low_span = (len(prefix), len(numstr))
+        match = speller._rule_table.lookup_prefix(prefix, len(numstr))
+        if match is None:
+            return
+        rule, plan = match
+        kinds = [kind == SLICE and value == low_span for kind, value in plan]
+        if kinds.count(True) != 1:
+            return
+        split = kinds.index(True)
+        for kind, value in plan[split+1:]:
+            if kind != LITERAL:
+                return
+        self.suffix = [value for _, value in plan[split+1:]]
+
+        head = expand_plan(numstr, plan[:split], speller._decompose)
+        renumber_squash(head)
+        lead, elements, words = split_words(head)
+        if not elements:
+            return
+        words[-1].append(GLUE)
+
+        # Apply the passes to the head alone, spilling the elements a match
+        # overlapping the tail could start with
+        self.passes = []
+        for parser in speller._parsers:
+            length = parser.pattern.length
+            if not parser.pattern.anchored_end:
+                for (start, end), _ in parser.isub(elements):
+                    words[start:end] = [words[end-1]]
+            spill = min(len(elements), max(0, len(elements) - length + 1))
+            self.passes.append((parser, spill, elements[spill:], words[spill:]))
+            del elements[spill:]
+            del words[spill:]
+
+        self.head = join_elements(lead, elements, words)
+        speller._lookup_words(self.head)
+        self.valid = True
+
+    def spell(self, low, components=None):
+        """Return the spelling of the number with the lowest group low
+
+        components is the decomposition of low, if it is already known; the
+        list is not modified. Return None if the number has to be spelled the
+        regular way.
+
+        """
+        if not low:
+            return
+        speller = self.speller
+        if components is None:
+            components = speller._decompose(str(low))
+        glue, elements, words = split_words(components)
+        if not elements or any(isorder(x) for x in elements):
+            return
+        words[-1].extend(self.suffix)
+
+        for parser, offset, spilled, spilled_words in self.passes:
+            if spilled:
+                elements = spilled + elements
+                words = spilled_words + words
+            if offset and parser.pattern.offset:
+                continue
+            resume = parser.pattern.length - 1
+            for (start, end), _ in parser.isub(elements):
+                words[start:end] = [words[end-1]]
+                if offset and start < resume:
+                    # The scan would go back into the head
+                    return
+
+        tail = join_elements([], elements, words)
+        speller._lookup_words(tail)
+        parts = []
+        for x in self.head + tail:
+            if x is GLUE:
+                parts.extend(glue)
             else:
-                new_num = int(''.join(mapping.get(x, x) for x in token))
-                result.extend(self._parse_num(new_num))
+                parts.append(x)
+        return join_words(parts)
 
-        return result
+
+def split_words(tokens):
+    """Split tokens into the leading words, numbers and orders, and the words
+    following each of the numbers and orders
+
+    """
+    lead = []
+    elements = []
+    words = []
+    for x in tokens:
+        if isnum(x) or isorder(x):
+            elements.append(x)
+            words.append([])
+        elif elements:
+            words[-1].append(x)
+        else:
+            lead.append(x)
+    return lead, elements, words
+
+def join_elements(lead, elements, words):
+    """Reverse of split_words"""
+    tokens = lead[:]
+    for x, following in zip(elements, words):
+        tokens.append(x)
+        tokens.extend(following)
+    return tokens
+
+
+class Stats(object):
+    """Timings and counters collected by an instrumented Speller"""
+
+    STAGES = ('decompose', 'squash', 'passes', 'lookup', 'whitespace')
+
+    def __init__(self, rules, parsers):
+        self.rules = rules
+        self.parsers = parsers
+        self.reset()
+
+    def reset(self):
+        self.spelled = 0
+        self.stage_times = [0.0] * len(self.STAGES)
+        self.stage_calls = 0
+        self.rule_hits = dict.fromkeys(self.rules, 0)
+        self.pass_hits = [0] * len(self.parsers)
+
+    def add_timings(self, timestamps):
+        """Account for one run through all stages
+
+        timestamps must contain the starting time of each stage followed by
+        the finishing time of the last one.
+
+        """
+        times = self.stage_times
+        for i in range(len(times)):
+            times[i] += timestamps[i+1] - timestamps[i]
+        self.stage_calls += 1
+
+    def snapshot(self):
+        return {
+            'spelled': self.spelled,
+            'stages': dict((name, {'time': t, 'calls': self.stage_calls})
+                           for name, t in zip(self.STAGES, self.stage_times)),
+            'rules': dict(("%s = %s" % (rule.pattern, rule.body), hits)
+                          for rule, hits in self.rule_hits.items()),
+            'passes': dict((parser.template, hits)
+                           for parser, hits in zip(self.parsers,
+                                                   self.pass_hits)),
+        }
 
 
 def rule_from_str(string):
@@ -155,38 +981,14 @@ def rule_from_str(string):
     return Rule(pattern, body)
 
 
-def first_match(numstr, rules):
-    """Find the first matching rule for the given number
-
-    This function only looks at the left-hand side of each rule -- the part
-    called 'pattern'. The rules are checked in order. The ones which do not
-    match the number are discarded.
-
-    For a pattern to match a given number, it must comply with the following
-    rules:
-
-      a) if it doesn't contain parentheses:
-
-         * it has the same number of characters (variables or digits) as the
-           number has digits
-         * each of the its digits (if it has any) has to match exactly with the
-           corresponding digits of the number
-
-      b) if it contains parentheses:
-
-         * the number of rightmost characters of the pattern which are not
-           enclosed in parentheses must be less than the number of digits in
-           the number
+def split_body(body):
+    """Split the body of a rule into a list of components
 
-    If we end up with no matching rules then the rule-set is not comprehensive
-    to cover all possible numbers or there are missing entries in one of the
-    lookup tables. Raise an exception and stop further processing.
+    Each variable template enclosed in braces becomes a separate component.
+    The text between templates is kept as is.
 
     """
-    for rule in filter(lambda rule: rule.matches(numstr), rules):
-        return rule
-
-    raise Exception('Could not find a suitable rule for the number %s' % numstr)
+    return body.replace('}', '},').replace('{', ',{').split(',')
 
 def resolve_bindings(pattern, numstr):
     """Return a dict with variable bindings obtained from numstr"""
@@ -197,6 +999,203 @@ def resolve_bindings(pattern, numstr):
     return mapping
 
 
+def resolve_positions(pattern, offset=0):
+    """Return a dict mapping each variable to the spans of digits it binds
+
+    This is the positional counterpart of resolve_bindings. Each span is a
+    (start, end) tuple of indices into the number string, shifted by offset.
+    Consecutive positions of the same variable are merged into one span.
+
+    """
+    mapping = {}
+    for index, var in enumerate(pattern):
+        if var.isdigit():
+            continue
+        spans = mapping.setdefault(var, [])
+        if spans and spans[-1][1] == offset + index:
+            spans[-1] = (spans[-1][0], offset + index + 1)
+        else:
+            spans.append((offset + index, offset + index + 1))
+    return mapping
+
+def digit_constraints(pattern):
+    """Return a tuple of (index, digit) pairs for each digit in pattern"""
+    return tuple((i, char) for i, char in enumerate(pattern) if char.isdigit())
+
+
+# Kinds of the compiled body components
+LITERAL, ORDER, SLICE, COMPOSITE = range(4)
+
+
+class RuleTable(object):
+    """A set of rules compiled for fast lookup
+
+    A pattern without parentheses matches numbers with as many digits as it
+    has characters, or as many as it covers with its dashes, whose digits
+    equal the pattern's digits at the same positions. A consuming pattern
+    matches numbers longer than the characters right of its parentheses. The
+    first rule matching a number is applied.
+
+    For each number length, the rules applicable to numbers of that length are
+    collected in order along with the digits they require at fixed positions.
+    Each rule body is compiled into a plan -- a tuple of (kind, value) pairs,
+    one per body component:
+
+      LITERAL    -- value is the text to insert as is
+      ORDER      -- a {*} template, value is None
+      SLICE      -- value is a (start, end) span of the number string
+      COMPOSITE  -- value is a list of spans and literal digits to be joined
+
+    Plans for numbers up to max_length digits, as long as the longest
+    pattern, are built right away. Longer numbers can only be matched by
+    consuming patterns, which impose no digits, so the first of them always
+    applies. Its spans are fixed relative to either end of the number: they
+    are found once by comparing its plans for two lengths, and the plan for
+    a longer number is derived from them on each lookup instead of being
+    stored.
+
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.max_length = max([x.max_length() for x in rules] + [0])
+        self._by_length = {}
+        for length in range(1, self.max_length + 1):
+            self._by_length[length] = self._compile(length)
+        self._long = self._compile_long()
+
+    def lookup(self, numstr, start=0, end=None):
+        """Return a (rule, plan) tuple for the first rule matching numstr
+
+        If start or end is given, only numstr[start:end] is matched, without
+        copying it. Spans in the plan are relative to start.
+
+        """
+        if end is None:
+            end = len(numstr)
+        length = end - start
+        candidates = self._by_length.get(length)
+        if candidates is None:
+            if length > self.max_length and self._long is not None:
+                return self._long[0], self._long_plan(length)
+            candidates = []
+
+        for constraints, rule, plan in candidates:
+            for index, digit in constraints:
+                if numstr[start + index] != digit:
+                    break
+            else:
+                return rule, plan
+
+        raise Exception('Could not find a suitable rule for the number %s'
+                        % numstr[start:end])
+
+    def lookup_prefix(self, prefix, length):
+        """Return a (rule, plan) tuple for numbers starting with prefix
+
+        The returned rule is the first one matching every number of the
+        given length that starts with prefix. Return None if no rule matches
+        or the first matching rule depends on the rest of the digits.
+
+        """
+        for constraints, rule, plan in self.candidates(length):
+            fixed = [(i, x) for i, x in constraints if i < len(prefix)]
+            for index, digit in fixed:
+                if prefix[index] != digit:
+                    break
+            else:
+                if len(fixed) < len(constraints):
+                    return
+                return rule, plan
+
+    def candidates(self, length):
+        """Return (constraints, rule, plan) tuples for numbers of a length
+
+        The rules which can match such numbers are listed in order.
+
+        """
+        candidates = self._by_length.get(length)
+        if candidates is not None:
+            return candidates
+        if length <= self.max_length or self._long is None:
+            return []
+        return [((), self._long[0], self._long_plan(length))]
+
+    def _compile(self, length):
+        candidates = []
+        for rule in self.rules:
+            positions = rule.positions(length)
+            if positions is None:
+                continue
+            plan = tuple(compile_component(x, positions)
+                         for x in rule.components)
+            candidates.append((rule.constraints, rule, plan))
+        return candidates
+
+    def _compile_long(self):
+        """Return (rule, plan, next_plan) for numbers longer than max_length
+
+        plan and next_plan are the plans of the first consuming rule for
+        numbers of max_length + 1 and max_length + 2 digits. The steps by
+        which the spans of each component move from one to the other are
+        stored in _long_steps. Return None if no rule matches such numbers.
+
+        """
+        self._long_steps = None
+        plans = [self._compile(x)[:1]
+                 for x in (self.max_length + 1, self.max_length + 2)]
+        if not plans[0]:
+            return None
+        (constraints, rule, plan), (_, _, next_plan) = plans[0][0], plans[1][0]
+        assert not constraints
+
+        steps = []
+        for index, (kind, value) in enumerate(plan):
+            next_value = next_plan[index][1]
+            if kind == SLICE:
+                step = (next_value[0] - value[0], next_value[1] - value[1])
+            elif kind == COMPOSITE:
+                step = [type(x) is tuple and (y[0] - x[0], y[1] - x[1])
+                        for x, y in zip(value, next_value)]
+            else:
+                continue
+            steps.append((index, kind, value, step))
+        self._long_steps = steps
+        return rule, plan, next_plan
+
+    def _long_plan(self, length):
+        """Return the plan of the consuming rule for numbers of a length"""
+        delta = length - self.max_length - 1
+        plan = list(self._long[1])
+        for index, kind, value, step in self._long_steps:
+            if kind == SLICE:
+                value = (value[0] + step[0] * delta, value[1] + step[1] * delta)
+            else:
+                value = [x and (y[0] + x[0] * delta, y[1] + x[1] * delta) or y
+                         for x, y in zip(step, value)]
+            plan[index] = kind, value
+        return tuple(plan)
+
+
+def compile_component(component, positions):
+    """Return a (kind, value) pair for one component of a rule body"""
+    match = re.match(r'{(.+?)}', component)
+    if not match:
+        # Equal literals of all rules become one object
+        return LITERAL, intern(component)
+
+    token = match.group(1)
+    if token == '*':
+        return ORDER, None
+
+    pieces = []
+    for char in token:
+        pieces.extend(positions.get(char, [char]))
+    if len(pieces) == 1 and type(pieces[0]) is tuple:
+        return SLICE, pieces[0]
+    return COMPOSITE, pieces
+
+
 class Rule(object):
     """The base class for different rule types
 
@@ -204,30 +1203,52 @@ class Rule(object):
 
     """
 
+    __slots__ = ('pattern', 'body', 'components', 'constraints')
+
     def __init__(self, pattern, body):
         self.pattern = pattern
         self.body = body
-
-    def matches(self, num):
-        """Return True if the rule's pattern matches num"""
-        return len(self.pattern) == len(num) and self._compare_digits(num)
+        self.components = split_body(body)
+        self.constraints = digit_constraints(pattern)
 
     def bind(self, numstr):
         """Return a dict with variable bindings"""
         return resolve_bindings(self.pattern, numstr)
 
-    def _compare_digits(self, num):
-        for (char, digit) in zip(self.pattern, num):
-            if char.isdigit() and char != digit:
-                return False
-        return True
+    def max_length(self):
+        """Return the length of the longest numbers the pattern spells out"""
+        return len(self.pattern)
+
+    def positions(self, length):
+        """Return variable positions for numbers of the given length
+
+        This is what bind() would return for any matching number of that
+        length, only with spans instead of digits. Return None if the rule
+        cannot match numbers of that length.
+
+        """
+        if len(self.pattern) != length:
+            return
+        return resolve_positions(self.pattern)
 
 
 class RecursiveRule(Rule):
     """A rule is called recursive if its pattern contains parentheses"""
 
-    def matches(self, num):
-        return self._chopped_len() < len(num)
+    __slots__ = ()
+
+    def __init__(self, pattern, body):
+        Rule.__init__(self, pattern, body)
+        # Consuming patterns must not contain digits
+        self.constraints = ()
+
+    def positions(self, length):
+        if self._chopped_len() >= length:
+            return
+        left, right = self.pattern[1:].split(')')
+        mapping = resolve_positions(right, length - len(right))
+        mapping[left] = [(0, length - len(right))]
+        return mapping
 
     def bind(self, numstr):
         def rsplit_index(s, index):
@@ -246,14 +1267,17 @@ class RecursiveRule(Rule):
 class MultiRule(Rule):
     """A rule is called a multi-rule if its pattern has at least one dash"""
 
+    __slots__ = ('len_range',)
+
     def __init__(self, pattern, body):
         Rule.__init__(self, pattern, body)
         dash_count = pattern.count('-')
         self.len_range = range(len(pattern) - dash_count, len(pattern) + 1)
         self.pattern = pattern.replace('-', '')
+        self.constraints = digit_constraints(self.pattern)
 
-    def matches(self, num):
-        return len(num) in self.len_range and self._compare_digits(num)
+    def max_length(self):
+        return self.len_range[-1]
 
     def bind(self, numstr):
         # Clone the leftmost variable a number of times so that the pattern
@@ -262,47 +1286,65 @@ class MultiRule(Rule):
                    + self.pattern[1:])
         return resolve_bindings(pattern, numstr)
 
+    def positions(self, length):
+        if length not in self.len_range:
+            return
+        pattern = (self.pattern[0] * (1 + length - self.len_range[0])
+                   + self.pattern[1:])
+        return resolve_positions(pattern)
+
 
 def apply_passes(tokens, passes, meta):
-    """Magic processing with index mangling
+    """Apply list passes to the tokens of a decomposed number
 
     Returns a new list with processed tokens.
 
     """
-    # distill tokens into a list of tuples with no whitespace or words
-    processed_tokens = [(index, x) for index, x in enumerate(tokens)
-                        if isnum(x) or isorder(x)]
-    secondary_list = [x for index, x in processed_tokens]
-    parts = tokens[:]
-    logging.debug("Processed: %s", processed_tokens)
-    logging.debug("Secondary: %s", secondary_list)
-    logging.debug("Component: %s", parts)
-
-    pass_no = 1
-    for pass_ in passes:
-        parser = listparse.Parser(pass_, meta)
-        new_list, ranges = parser.sub(secondary_list)
-        if not ranges:
-            continue
-
-        stored_list = secondary_list[:]
-        for r in ranges:
-            start, end = r
-            start_index = processed_tokens[start][0]
-            end_index = processed_tokens[end-1][0]
+    return apply_parsers(list(tokens), [listparse.Parser(x, meta)
+                                        for x in passes])
 
-            processed_tokens[start:end] = [(-1, None)]
+def apply_parsers(tokens, parsers, hits=None, trace=None):
+    """Same as apply_passes but with passes already turned into parsers
 
-            subst = [new_list[start]]
-            secondary_list[start:end] = subst
-            parts[start_index:end_index+1] = subst
+    The tokens are processed in place and returned.
 
-            for i in range(start+1, len(processed_tokens)):
-                index, token = processed_tokens[i]
-                processed_tokens[i] = (index - (end_index - start_index), token)
-        logging.debug("Pass #%s:\n    %s\n    -> %s\n    -> %s\n", pass_no, stored_list, pass_, secondary_list)
-        pass_no += 1
-    if pass_no > 1:
-        logging.debug("After final pass:\n    %s\n", parts)
+    If hits is a list, the number of substitutions made by each parser is
+    added to the corresponding element. If trace is a list, a PassResult is
+    appended to it for each parser.
 
-    return parts
+    """
+    # The passes only see numbers and orders, the secondary list. The index
+    # of each secondary element in tokens is kept in an array. Replacing a
+    # range of secondary elements along with the words in between stores
+    # the new element in place of the first one and blanks out the other
+    # tokens up to the last one. The blanks are dropped after all passes.
+    positions = array.array('l')
+    for index, x in enumerate(tokens):
+        if type(x) is int or x.isdigit():
+            positions.append(index)
+    secondary_list = [tokens[index] for index in positions]
+
+    blanked = False
+    for parser_no, parser in enumerate(parsers):
+        if trace is not None:
+            before = secondary_list[:]
+
+        count = 0
+        for (start, end), element in parser.isub(secondary_list):
+            first = positions[start]
+            tokens[first] = element
+            if end - start > 1:
+                for index in xrange(first + 1, positions[end-1] + 1):
+                    tokens[index] = None
+                del positions[start+1:end]
+                blanked = True
+            count += 1
+
+        if hits is not None:
+            hits[parser_no] += count
+        if trace is not None:
+            trace.append(PassResult(parser.template, before, secondary_list[:]))
+
+    if blanked:
+        tokens[:] = [x for x in tokens if x is not None]
+    return tokens
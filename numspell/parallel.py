@@ -0,0 +1,83 @@
+"""Spelling of large batches of numbers in several processes
+
+Each worker process builds its own Speller once and then spells chunks of
+numbers sent to it by the parent. Only the language code and the Speller
+options are sent to the workers, never the Speller itself, because language
+definitions contain functions which cannot be pickled.
+
+"""
+
+__all__ = ['spell_parallel']
+
+
+import collections
+import itertools
+import multiprocessing
+
+from numspell import Speller
+
+
+# The Speller of the current worker process
+_speller = None
+
+
+def _init_worker(lang, options):
+    global _speller
+    _speller = Speller(lang, **options)
+
+def _spell_chunk(chunk):
+    return list(_speller.spell_many(chunk))
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def spell_parallel(nums, lang="en", processes=None, chunk_size=1000,
+                   pairs=False, **options):
+    """Generate spellings for each integer in nums using a process pool
+
+    The numbers are split into chunks which are spelled by the workers. The
+    spellings are yielded in the order of nums as soon as they are ready. At
+    most two chunks per worker are in flight at any time, so memory use does
+    not depend on the length of nums.
+
+    Arguments:
+      nums        -- iterable of numbers to spell
+      lang        -- language code in ISO 639-1 format
+      processes   -- number of worker processes; defaults to the number of
+                     CPUs
+      chunk_size  -- how many numbers to send to a worker at once
+      pairs       -- if True then yield (num, spelling) tuples instead of
+                     plain spellings
+      options     -- other keyword arguments for the Speller constructor
+
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, _init_worker, (lang, options))
+    try:
+        pending = collections.deque()
+        for chunk in _chunks(nums, chunk_size):
+            pending.append((chunk, pool.apply_async(_spell_chunk, (chunk,))))
+            if len(pending) >= 2 * processes:
+                for x in _collect(pending.popleft(), pairs):
+                    yield x
+        while pending:
+            for x in _collect(pending.popleft(), pairs):
+                yield x
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _collect(item, pairs):
+    chunk, async_result = item
+    spellings = async_result.get()
+    if pairs:
+        return zip(chunk, spellings)
+    return spellings
@@ -0,0 +1,215 @@
+"""List passes applied with regular expressions
+
+This is an alternative to applying listparse parsers to a list of tokens.
+The tokens are serialized into one string, each pass is compiled into a
+regular expression, and the search for matching elements is left to the re
+module. The result is the same as that of numspell.apply_parsers.
+
+Each token takes one field of the string:
+
+  \\x1d TEXT                -- a word, i.e. any other string
+  \\x1f FLAGS \\x1e TEXT     -- a number or a string produced by a pass
+  \\x1f FLAGS \\x1c DIGITS   -- an order
+
+FLAGS holds one letter for each matcher function of the passes which
+accepts the element. The functions are called once per element, when it is
+serialized or produced by a pass, rather than during the search. A matcher
+token becomes a test for its letter, a literal token a test for the text.
+Any words between the elements of a match are skipped, and dropped along
+with the replaced elements.
+
+Usually the element produced by a pass cannot be matched by the same pass.
+Then all its matches are replaced in a single re.sub call. Otherwise the
+search has to be resumed before each new element, as Parser.isub does.
+
+"""
+
+__all__ = ['RegexPasses']
+
+
+import re
+
+import listparse
+
+
+WORD, ELEMENT, STRING, ORDER = '\x1d', '\x1f', '\x1e', '\x1c'
+
+# Any number of words
+GAP = r'(?:\x1d[^\x1d\x1f]*)*'
+
+FIELD_RE = re.compile(r'([\x1d\x1f])([^\x1d\x1f]*)')
+
+
+class RegexPasses(object):
+    """The list passes of a language compiled into regular expressions
+
+    Matcher functions must accept any element, since they are called on
+    every one of them.
+
+    """
+
+    def __init__(self, parsers, meta):
+        self.parsers = parsers
+        self.matchers = []      # (flag, function) pairs
+        flags = {}
+        for parser in parsers:
+            for token in parser.pattern.core:
+                if type(token) is listparse.MatcherToken \
+                        and token.name not in flags:
+                    flags[token.name] = chr(ord('A') + len(flags))
+                    self.matchers.append((flags[token.name],
+                                          meta[token.name + "~find"]))
+        self.passes = [CompiledPass(parser, flags) for parser in parsers]
+
+    def apply(self, tokens, hits=None):
+        """Apply the passes to tokens in place and return them
+
+        If hits is a list, the number of substitutions made by each pass is
+        added to the corresponding element.
+
+        """
+        string = self.serialize(tokens)
+        for pass_no, compiled in enumerate(self.passes):
+            string, count = compiled.apply(string, self.element)
+            if hits is not None:
+                hits[pass_no] += count
+        tokens[:] = deserialize(string)
+        return tokens
+
+    def element(self, x):
+        """Return the field of a number, an order or a pass output"""
+        flags = ''.join([flag for flag, fn in self.matchers if fn(x)])
+        if type(x) is int:
+            return '%s%s%s%d' % (ELEMENT, flags, ORDER, x)
+        return '%s%s%s%s' % (ELEMENT, flags, STRING, x)
+
+    def serialize(self, tokens):
+        element = self.element
+        return ''.join([(type(x) is int or x.isdigit()) and element(x)
+                        or WORD + x for x in tokens])
+
+
+def deserialize(string):
+    """Return the list of tokens serialized in string"""
+    tokens = []
+    for kind, field in FIELD_RE.findall(string):
+        if kind == WORD:
+            tokens.append(field)
+        else:
+            tokens.append(decode(field))
+    return tokens
+
+def decode(field):
+    """Return the element in a field without its leading marker"""
+    pos = field.find(ORDER)
+    if pos >= 0:
+        return int(field[pos+1:])
+    return field[field.index(STRING)+1:]
+
+
+class CompiledPass(object):
+    """One list pass as a regular expression
+
+    The expression has a group for the left phantoms, one for each
+    substitution token and a lookahead for the right phantoms.
+
+    """
+
+    def __init__(self, parser, flags):
+        pattern = parser.pattern
+        self.template = parser.template
+        self.body = parser.body
+        self.length = pattern.length
+        self.anchored = bool(pattern.offset)
+
+        core = pattern.core
+        left = pattern.insets[0]
+        right = pattern.length + pattern.insets[1]
+        subs = set(id(x) for x in pattern.subs)
+        self.names = []
+        self.letters = set()    # flags and texts which the pass can match
+        self.literals = set()
+        regexes = []
+        for token in core:
+            if type(token) is listparse.MatcherToken:
+                self.letters.add(flags[token.name])
+                regex = r'\x1f[^\x1e\x1c]*%s[^\x1e\x1c]*' % re.escape(
+                        flags[token.name])
+                field = r'[\x1e\x1c][^\x1d\x1f]*'
+            else:
+                self.literals.add(token.string)
+                regex = r'\x1f[^\x1e\x1c]*\x1e'
+                field = re.escape(token.string) + r'(?=[\x1d\x1f]|\Z)'
+            if id(token) in subs:
+                self.names.append(token.name)
+                field = '(%s)' % field
+            regexes.append(regex + field)
+
+        source = '(%s)%s' % (''.join(x + GAP for x in regexes[:left]),
+                             GAP.join(regexes[left:right]))
+        if right < len(regexes):
+            source += '(?=%s)' % ''.join(GAP + x for x in regexes[right:])
+        if pattern.anchored_end:
+            source += r'(?=%s\Z)' % GAP
+        self.regex = re.compile(source)
+
+    def apply(self, string, element):
+        """Apply the pass to a serialized list of tokens
+
+        element is the function serializing a new element. Return a
+        (new string, number of substitutions) tuple.
+
+        """
+        if not self.length:
+            return string, 0
+        if not self.anchored:
+            conflicts = []
+
+            def replace(match):
+                new = self.replacement(match)
+                field = element(new)
+                if new in self.literals or self.letters.intersection(
+                        field[1:field.index(STRING)]):
+                    conflicts.append(new)
+                return match.group(1) + field
+
+            result = self.regex.subn(replace, string)
+            if not conflicts:
+                return result
+        return self.apply_each(string, element)
+
+    def apply_each(self, string, element):
+        """Same as apply but replaces one match at a time"""
+        pos = 0
+        count = 0
+        while True:
+            if self.anchored:
+                # Only a match of the first element counts
+                first = string.find(ELEMENT)
+                if first < 0 or pos > first:
+                    return string, count
+                match = self.regex.match(string, first)
+            else:
+                match = self.regex.search(string, pos)
+            if match is None:
+                return string, count
+
+            prefix = string[:match.start()] + match.group(1)
+            string = (prefix + element(self.replacement(match))
+                      + string[match.end():])
+            count += 1
+
+            # Matches overlapping the new element might start up to
+            # length - 1 elements before it
+            pos = len(prefix)
+            for _ in xrange(self.length - 1):
+                pos = string.rfind(ELEMENT, 0, pos)
+                if pos < 0:
+                    pos = 0
+                    break
+
+    def replacement(self, match):
+        """Return the element replacing a match"""
+        values = [decode(x) for x in match.groups()[1:]]
+        return self.body.format([listparse.Group(name, value)
+                                 for name, value in zip(self.names, values)])
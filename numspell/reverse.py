@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Parsing of spelled numbers back into integers
+
+The vocabulary of a language is collected from the Speller's tables, rules
+and list passes into a WordIndex -- a character trie mapping each word to
+its meaning:
+
+  NUMBER      -- a word from NUMBERS or one produced by a list pass in place
+                 of a number, e.g. Spanish 'veintiún'
+  ORDER       -- a word from ORDERS or one of its forms produced by a list
+                 pass, e.g. Russian 'тысячи'; its value is the multiplier of
+                 the order
+  MULTIPLIER  -- a rule literal following a variable, e.g. English 'hundred'
+  FILLER      -- any other rule literal, e.g. Spanish 'y'
+
+The words produced by the list passes are found by applying each pass to
+every combination of numbers and orders its pattern can match. The words of
+the output which are not in the vocabulary yet are assigned the meanings of
+the replaced elements in order.
+
+"""
+
+__all__ = ['WordIndex']
+
+
+import itertools
+import re
+
+
+NUMBER, ORDER, MULTIPLIER, FILLER = range(4)
+
+
+class WordIndex(object):
+    """A trie of the words used by a Speller"""
+
+    def __init__(self, speller):
+        self._trie = {}
+        self.words = {}
+
+        digits = speller._group_digits()
+        self.base = 10 ** (digits or 3)
+        for num, word in speller.NUMBERS.items():
+            self.add(word, NUMBER, num)
+        for order, word in enumerate(speller.ORDERS):
+            if order:
+                self.add(word, ORDER, self.base ** order)
+        for rule in speller.RULES:
+            self._add_literals(rule)
+        for parser in speller._parsers:
+            self._add_pass_outputs(parser, speller)
+
+    def add(self, word, kind, value):
+        """Add each whitespace-separated word with the given meaning
+
+        Words already in the index keep their meaning.
+
+        """
+        for word in word.split():
+            if word in self.words:
+                continue
+            self.words[word] = (kind, value)
+            node = self._trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[None] = (kind, value)
+
+    def tokenize(self, text):
+        """Generate the (kind, value) meaning of each word in text
+
+        At each position the longest word from the index is taken, so words
+        need not be separated by whitespace. Raise ValueError if the text
+        contains anything else.
+
+        """
+        pos = 0
+        length = len(text)
+        while pos < length:
+            if text[pos].isspace():
+                pos += 1
+                continue
+            node = self._trie
+            meaning = None
+            end = pos
+            while end < length and text[end] in node:
+                node = node[text[end]]
+                end += 1
+                if None in node:
+                    meaning, word_end = node[None], end
+            if meaning is None:
+                raise ValueError("Unknown word at position %d: %r"
+                                 % (pos, text[pos:pos+20]))
+            yield meaning
+            pos = word_end
+
+    def parse(self, text):
+        """Return the integer spelled in text
+
+        The text is not checked to be a well-formed spelling, only made of
+        known words.
+
+        """
+        if type(text) is str:
+            text = text.decode('utf-8')
+        text = text.lower().encode('utf-8')
+
+        # A multiplier scales the trailing terms which are smaller than it
+        total = 0
+        terms = []
+        found = False
+        for kind, value in self.tokenize(text):
+            found = True
+            if kind == NUMBER or kind == MULTIPLIER:
+                scaled = 0
+                if kind == MULTIPLIER or is_power_of_ten(value):
+                    while terms and terms[-1] < value:
+                        scaled += terms.pop()
+                terms.append((scaled or 1) * value)
+            elif kind == ORDER:
+                total += (sum(terms) or 1) * value
+                terms = []
+        if not found:
+            raise ValueError("No number in %r" % text)
+        return total + sum(terms)
+
+    def _add_literals(self, rule):
+        if ')' in rule.pattern:
+            positions = {}
+        else:
+            positions = rule.positions(len(rule.pattern))
+        weight = None
+        for component in rule.components:
+            match = re.match(r'{(.+?)}$', component)
+            if match:
+                # Only a literal after a lone variable is a multiplier
+                spans = positions.get(match.group(1), ())
+                weight = None
+                if len(spans) == 1:
+                    weight = 10 ** (len(rule.pattern) - spans[0][1])
+            elif component.strip():
+                if weight is not None and weight > 1:
+                    self.add(component, MULTIPLIER, weight)
+                else:
+                    self.add(component, FILLER, None)
+
+    def _add_pass_outputs(self, parser, speller):
+        pattern = parser.pattern
+        candidates = ([str(x) for x in speller.NUMBERS]
+                      + range(1, len(speller.ORDERS)))
+        domains = []
+        for token in pattern.core:
+            if hasattr(token, 'string'):
+                domains.append([token.string])
+            else:
+                domains.append([x for x in candidates if token.fn(x)])
+
+        replaced = slice(pattern.insets[0], pattern.length + pattern.insets[1])
+        for values in itertools.product(*domains):
+            output = parser.body.format(pattern.groups(values))
+            inputs = [self._meaning(x) for x in values[replaced]]
+
+            unknown = []
+            for word in output.split():
+                if self.words.get(word) in inputs:
+                    inputs.remove(self.words[word])
+                elif word not in self.words:
+                    unknown.append(word)
+            if len(unknown) == len(inputs):
+                for word, (kind, value) in zip(unknown, inputs):
+                    self.add(word, kind, value)
+
+    def _meaning(self, element):
+        if type(element) is int:
+            return ORDER, self.base ** element
+        return NUMBER, int(element)
+
+
+def is_power_of_ten(num):
+    return num >= 10 and str(num).strip('0') == '1'
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""A local spelling service speaking newline-delimited JSON
+
+Run it from the command line:
+
+    python -m numspell.server [--tcp=HOST:PORT | --unix=PATH] [--lang=LANG ...]
+
+Each request is a JSON object on its own line. The response to it is a JSON
+object on its own line too; responses come in the order of requests on the
+connection. The 'id' of a request, if any, is copied into its response.
+
+    {"op": "spell", "lang": "es", "number": 21}
+        -> {"spelling": "veintiuno"}
+    {"op": "check", "number": 3, "spelling": "tree"}
+        -> {"correct": false, "spelling": "three"}
+    {"op": "parse", "lang": "ru", "text": "две тысячи"}
+        -> {"number": 2000}
+    {"op": "metrics"}
+        -> {"requests": ..., "latency_us": {...}, ...}
+
+'op' defaults to "spell" and 'lang' to the first language the server was
+started with. Numbers may also be given as strings of digits. A request which
+cannot be served gets an {"error": message} response.
+
+There is one warmed Speller per language, used by a single worker thread.
+Requests from all connections are put into a bounded queue of that language.
+The worker takes whatever requests have accumulated, up to batch_size, and
+serves them as one batch. When a queue is full, the connections submitting
+to it stop reading until there is room, which pushes back on the clients.
+
+"""
+
+__all__ = ['SpellingService', 'make_server', 'main']
+
+
+import argparse
+import collections
+import json
+import os
+import Queue
+import SocketServer
+import sys
+import threading
+import timeit
+
+import numspell
+
+
+class Request(object):
+    """A request waiting for its response"""
+
+    __slots__ = ('message', 'received', 'response', 'failed', 'done')
+
+    def __init__(self, message):
+        self.message = message
+        self.received = timeit.default_timer()
+        self.response = None
+        self.failed = False
+        self.done = threading.Event()
+
+    def reply(self, result):
+        self.failed = 'error' in result
+        if 'id' in self.message:
+            result['id'] = self.message['id']
+        self.response = json.dumps(result)
+        self.done.set()
+
+
+class Metrics(object):
+    """Counters and recent latencies of a SpellingService"""
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self.started = timeit.default_timer()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+
+    def add_batch(self, requests, now):
+        with self._lock:
+            self.batches += 1
+            self.batched += len(requests)
+            for request in requests:
+                self._add(request, now)
+
+    def add_request(self, request, now):
+        with self._lock:
+            self._add(request, now)
+
+    def _add(self, request, now):
+        self.requests += 1
+        if request.failed:
+            self.errors += 1
+        self._latencies.append(now - request.received)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            batched = self.batched
+            elapsed = timeit.default_timer() - self.started
+            result = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': self.batches,
+                'requests_per_sec': elapsed and self.requests / elapsed,
+                'uptime_sec': elapsed,
+            }
+        result['mean_batch_size'] = self.batches and float(batched) / self.batches
+        result['latency_us'] = dict(
+                ('p%d' % (x * 100), percentile(latencies, x) * 1e6)
+                for x in (0.5, 0.9, 0.99))
+        return result
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class SpellingService(object):
+    """Spellers and their request queues, independent of the transport
+
+    Arguments:
+      languages    -- language codes to serve; the first one is the default
+      queue_size   -- capacity of the request queue of each language
+      batch_size   -- maximum number of requests served as one batch
+      batch_delay  -- seconds to wait for more requests before serving a
+                      batch smaller than batch_size; 0 serves whatever has
+                      accumulated right away
+      options      -- other keyword arguments for the Speller constructor
+
+    """
+
+    def __init__(self, languages=('en',), queue_size=1024, batch_size=64,
+                 batch_delay=0, **options):
+        self.languages = list(languages)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.metrics = Metrics()
+        self.spellers = {}
+        self.queues = {}
+        self._workers = []
+        for lang in self.languages:
+            self.spellers[lang] = numspell.Speller(lang, **options)
+            self.queues[lang] = Queue.Queue(queue_size)
+
+    def start(self):
+        for lang in self.languages:
+            worker = threading.Thread(target=self._work, args=(lang,),
+                                      name="numspell-%s" % lang)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self):
+        for lang in self.languages:
+            self.queues[lang].put(None)
+        for worker in self._workers:
+            worker.join()
+        del self._workers[:]
+
+    def submit(self, line):
+        """Return a Request for the JSON line, queued to be served
+
+        Blocks while the queue of the request's language is full.
+
+        """
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if type(message) is not dict:
+            request = Request({})
+            self._fail(request, "Request must be a JSON object")
+            return request
+
+        request = Request(message)
+        lang = message.get('lang', self.languages[0])
+        op = message.get('op', 'spell')
+        if op == 'metrics':
+            result = self.metrics.snapshot()
+            result['queue_depth'] = dict((x, self.queues[x].qsize())
+                                         for x in self.languages)
+            request.reply(result)
+        elif not isinstance(lang, basestring) or lang not in self.queues:
+            self._fail(request, "Unsupported language: %s" % (lang,))
+        elif not isinstance(op, basestring) or op not in OPERATIONS:
+            self._fail(request, "Unknown operation: %s" % (op,))
+        else:
+            self.queues[lang].put(request)
+        return request
+
+    def _fail(self, request, error):
+        request.reply({'error': error})
+        self.metrics.add_request(request, timeit.default_timer())
+
+    def _work(self, lang):
+        speller = self.spellers[lang]
+        queue = self.queues[lang]
+        while True:
+            batch = [queue.get()]
+            deadline = timeit.default_timer() + self.batch_delay
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    timeout = deadline - timeit.default_timer()
+                    if timeout > 0:
+                        batch.append(queue.get(timeout=timeout))
+                    else:
+                        batch.append(queue.get_nowait())
+            except Queue.Empty:
+                pass
+
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            for request in batch:
+                message = request.message
+                try:
+                    result = OPERATIONS[message.get('op', 'spell')](speller,
+                                                                    message)
+                except Exception as e:
+                    # Any failure is the request's own, it must never stop
+                    # the worker serving the language
+                    result = {'error': describe_error(e)}
+                request.reply(result)
+            if batch:
+                self.metrics.add_batch(batch, timeit.default_timer())
+            if stop:
+                return
+
+
+def describe_error(error):
+    if type(error) is KeyError:
+        return "Missing field: %s" % error.args[0]
+    return str(error)
+
+def get_number(message):
+    number = message['number']
+    if type(number) not in (int, long, unicode):
+        raise ValueError("Not a number: %r" % (number,))
+    return number
+
+def op_spell(speller, message):
+    return {'spelling': speller.spell(get_number(message))}
+
+def op_check(speller, message):
+    spelling = message['spelling']
+    if type(spelling) is unicode:
+        spelling = spelling.encode('utf-8')
+    correct = speller.check(get_number(message), spelling)
+    if correct is None:
+        return {'correct': True, 'spelling': spelling}
+    return {'correct': False, 'spelling': correct}
+
+def op_parse(speller, message):
+    return {'number': speller.parse(message['text'])}
+
+OPERATIONS = {
+    'spell': op_spell,
+    'check': op_check,
+    'parse': op_parse,
+}
+
+
+class StreamHandler(SocketServer.StreamRequestHandler):
+    """Reads the requests of one connection and writes their responses
+
+    Responses are written by a separate thread, so that the requests of a
+    connection can be batched together.
+
+    """
+
+    def handle(self):
+        service = self.server.service
+        pending = Queue.Queue(service.batch_size)
+        writer = threading.Thread(target=self._write, args=(pending,))
+        writer.daemon = True
+        writer.start()
+        try:
+            for line in iter(self.rfile.readline, ''):
+                if line.strip():
+                    pending.put(service.submit(line))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def _write(self, pending):
+        broken = False
+        while True:
+            request = pending.get()
+            if request is None:
+                return
+            request.done.wait()
+            if broken:
+                continue
+            try:
+                self.wfile.write(request.response + '\n')
+            except EnvironmentError:
+                # Keep draining the requests until the reader stops
+                broken = True
+
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(address, service):
+    """Return a threading socket server for the service
+
+    address is either a (host, port) tuple or the path of a Unix socket.
+    The service is started; call service.stop() after server_close().
+
+    """
+    if isinstance(address, basestring):
+        server = UnixServer(address, StreamHandler)
+    else:
+        server = TCPServer(address, StreamHandler)
+    server.service = service
+    service.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m numspell.server",
+                description='Serve spellings over a socket')
+    parser.add_argument('--tcp', metavar='HOST:PORT',
+            help="listen on a TCP address (default: 127.0.0.1:8765)")
+    parser.add_argument('--unix', metavar='PATH',
+            help="listen on a Unix socket instead")
+    parser.add_argument('-l', '--lang', action='append',
+            help="language to serve, can be given several times; the first "
+                 "one is the default (default: en)")
+    parser.add_argument('--queue-size', type=int, default=1024,
+            help="requests queued per language (default: 1024)")
+    parser.add_argument('--batch-size', type=int, default=64,
+            help="maximum requests served at once (default: 64)")
+    parser.add_argument('--batch-delay', type=float, default=0,
+            help="seconds to wait for a batch to fill up (default: 0)")
+    args = parser.parse_args(argv)
+    if args.tcp and args.unix:
+        parser.error("--tcp and --unix are mutually exclusive")
+
+    if args.unix:
+        address = args.unix
+        if os.path.exists(address):
+            os.unlink(address)
+    else:
+        host, _, port = (args.tcp or '127.0.0.1:8765').rpartition(':')
+        address = (host, int(port))
+
+    service = SpellingService(args.lang or ['en'], args.queue_size,
+                              args.batch_size, args.batch_delay)
+    server = make_server(address, service)
+    print >>sys.stderr, "Serving %s on %s" % (', '.join(service.languages),
+                                               args.unix or '%s:%d' % address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,38 @@
-__all__ = ['squash']
+__all__ = ['squash', 'isquash']
 
 
-from operator import add, eq
+def isquash(predicate, iterable):
+    """Squash multiple consecutive elements into one, lazily
+
+    This is a generator version of squash. It accepts any iterable and
+    produces the elements of the result one by one in a single pass.
+
+    """
+    in_run = False      # True after an element satisfying the predicate
+    gap = []            # whitespace elements seen since that element
+    for x in iterable:
+        if predicate(x):
+            if in_run:
+                # Drop the whitespace in between along with the element
+                del gap[:]
+                continue
+            in_run = True
+            yield x
+            continue
+
+        assert type(x) is str
+        if in_run:
+            if not x.strip():
+                gap.append(x)
+                continue
+            for y in gap:
+                yield y
+            del gap[:]
+            in_run = False
+        yield x
+
+    for y in gap:
+        yield y
 
 
 def squash(predicate, list_):
@@ -22,38 +53,8 @@ def squash(predicate, list_):
       A new list with squashed elements. The input list remains unchanged.
 
     """
-
-    assert not filter(lambda x: not (predicate(x) or type(x) is str), list_)
-
-    def find(index, list_):
-        """Find the first element which satisfies the predicate
-
-        Return the index of the first element in list_[index:] for which
-        predicate(elem) is True.
-
-        Return -1 if no such  element has been found.
-
-        """
-        indices = [i for i, x in enumerate(list_[index:]) if predicate(x)]
-        if indices:
-            return index + indices[0]
-        return -1
-
-    result = list_[:]
-    base = 0
-    while True:
-        base = find(base, result)
-        if base < 0:
-            break
-
-        n = find(base+1, result)
-        if n < 0:
-            break
-
-        if not reduce(add, result[base+1:n], '').strip():
-            # There are either no elements or only whitespace and empty string
-            # elements between base and n.
-            result[base+1:n+1] = []
-        else:
-            base = n
+    result = list(isquash(predicate, list_))
+    if type(list_) is str:
+        # A string is a sequence of strings; keep its type
+        return ''.join(result)
     return result
@@ -0,0 +1,228 @@
+"""Precomputed spellings of a range of numbers
+
+A SpellingTable keeps the spellings of all numbers in range(start, stop) in
+one string, the buffer, along with an array of offsets into it: the spelling
+of num is buffer[offsets[i]:offsets[i+1]] where i = num - start. This takes
+a fraction of the memory a dict of strings would, and looking a number up
+only allocates the returned string.
+
+A table can be saved to a file and mapped back into memory with load(). The
+file is read-only and shared by all processes that map it. It consists of a
+header, the offsets as little-endian unsigned integers and the spellings
+encoded in UTF-8. The header holds the digest of the language module's
+source, so that a table built from an outdated module is rejected.
+
+"""
+
+__all__ = ['SpellingTable', 'MappedSpellingTable', 'load']
+
+
+import array
+import mmap
+import os
+import struct
+import sys
+
+import langcache
+
+
+BATCH_SIZE = 10000
+
+# Bump this whenever the layout of the file changes
+FORMAT_VERSION = 1
+MAGIC = 'NUMSPTBL'
+
+# magic, version, language, source digest, start, stop, offset size,
+# payload size
+HEADER = struct.Struct('<8sI8s20sQQIQ')
+
+
+class SpellingTable(object):
+    """Spellings of the numbers in range(start, stop)"""
+
+    def __init__(self, start, stop, buffer, offsets):
+        self.start = start
+        self.stop = stop
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, speller, start, stop):
+        """Spell every number in range(start, stop) with speller"""
+        if not 0 <= start <= stop:
+            raise ValueError("Invalid table range: %d..%d" % (start, stop))
+
+        # Spellings are joined in batches to keep the number of small
+        # strings alive at any time low
+        batches = []
+        batch = []
+        offsets = array.array('L', [0])
+        end = 0
+        for spelling in speller.spell_range(start, stop):
+            batch.append(spelling)
+            end += len(spelling)
+            offsets.append(end)
+            if len(batch) == BATCH_SIZE:
+                batches.append(''.join(batch))
+                batch = []
+        batches.append(''.join(batch))
+
+        if end < 2 ** 32:
+            offsets = array.array('I', offsets)
+        return cls(start, stop, ''.join(batches), offsets)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __contains__(self, num):
+        return type(num) is int and self.start <= num < self.stop
+
+    def get(self, num, default=None):
+        """Return the spelling of num or default if num is not in the table"""
+        if type(num) is not int or not self.start <= num < self.stop:
+            return default
+        index = num - self.start
+        return self.buffer[self.offsets[index]:self.offsets[index+1]]
+
+    def chain(self, fallback):
+        """Return a function of one argument that looks a number up
+
+        Numbers missing from the table are passed to fallback.
+
+        """
+        start, stop = self.start, self.stop
+        buffer, offsets = self.buffer, self.offsets
+
+        def get(num):
+            if type(num) is int and start <= num < stop:
+                index = num - start
+                return buffer[offsets[index]:offsets[index+1]]
+            return fallback(num)
+        return get
+
+    def nbytes(self):
+        """Return the memory taken by the buffer and the offsets"""
+        return len(self.buffer) + len(self.offsets) * self.offsets.itemsize
+
+    def save(self, path, lang, digest):
+        """Write the table to path for the language with the source digest
+
+        The file is written with langcache.write_atomic() and is read-only.
+
+        """
+        offsets = array.array(self.offsets.typecode, self.offsets)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, lang, digest.decode('hex'),
+                             self.start, self.stop, offsets.itemsize,
+                             len(self.buffer))
+
+        def write(file_):
+            file_.write(header)
+            file_.write(offsets.tostring())
+            file_.write(self.buffer)
+        langcache.write_atomic(path, write, 0o444)
+
+
+class MappedSpellingTable(SpellingTable):
+    """A SpellingTable backed by a memory-mapped file
+
+    The offsets are read from the mapping as needed and the spellings are
+    sliced directly out of it, nothing is copied into the process memory.
+
+    """
+
+    def __init__(self, start, stop, mapping, itemsize):
+        self.mapping = mapping
+        self._index_pos = HEADER.size
+        self._payload_pos = HEADER.size + (stop - start + 1) * itemsize
+        self._itemsize = itemsize
+        self._pair = struct.Struct(itemsize == 4 and '<II' or '<QQ')
+        SpellingTable.__init__(self, start, stop,
+                               buffer(mapping, self._payload_pos),
+                               MappedOffsets(mapping, self._index_pos,
+                                             stop - start + 1, itemsize))
+
+    def get(self, num, default=None):
+        if type(num) is not int or not self.start <= num < self.stop:
+            return default
+        return self._lookup(num - self.start)
+
+    def chain(self, fallback):
+        start, stop = self.start, self.stop
+        lookup = self._lookup
+
+        def get(num):
+            if type(num) is int and start <= num < stop:
+                return lookup(num - start)
+            return fallback(num)
+        return get
+
+    def _lookup(self, index):
+        begin, end = self._pair.unpack_from(
+                self.mapping, self._index_pos + index * self._itemsize)
+        return self.mapping[self._payload_pos + begin:self._payload_pos + end]
+
+    def nbytes(self):
+        # The pages of the file belong to the shared page cache
+        return 0
+
+    def close(self):
+        self.mapping.close()
+
+
+class MappedOffsets(object):
+    """Read-only sequence of the offsets stored in a mapped file"""
+
+    def __init__(self, mapping, pos, length, itemsize):
+        self._mapping = mapping
+        self._pos = pos
+        self._length = length
+        self._item = struct.Struct(itemsize == 4 and '<I' or '<Q')
+        self.itemsize = itemsize
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._length:
+            raise IndexError("offset index out of range")
+        return self._item.unpack_from(self._mapping,
+                                      self._pos + index * self.itemsize)[0]
+
+
+def load(path, lang, digest):
+    """Map the table stored in path into memory
+
+    Raise ValueError if the file is not a table of the current format for
+    the language or was built from a language module with another source
+    digest.
+
+    """
+    with open(path, 'rb') as file_:
+        size = os.fstat(file_.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError("%s: not a spelling table" % path)
+        mapping = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        (magic, version, file_lang, file_digest, start, stop, itemsize,
+         payload_size) = HEADER.unpack_from(mapping)
+        if magic != MAGIC:
+            raise ValueError("%s: not a spelling table" % path)
+        if version != FORMAT_VERSION:
+            raise ValueError("%s: unsupported format version %d"
+                             % (path, version))
+        if file_lang.rstrip('\0') != lang:
+            raise ValueError("%s: table for another language: %s"
+                             % (path, file_lang.rstrip('\0')))
+        if file_digest.encode('hex') != digest:
+            raise ValueError("%s: built from another version of the "
+                             "language module" % path)
+        if (itemsize not in (4, 8) or size != HEADER.size + payload_size
+                + (stop - start + 1) * itemsize):
+            raise ValueError("%s: truncated or corrupt table" % path)
+    except:
+        mapping.close()
+        raise
+    return MappedSpellingTable(int(start), int(stop), mapping, itemsize)
@@ -0,0 +1,72 @@
+"""Structured traces of the spelling algorithm
+
+A Trace records every step the Speller takes to spell one number: the rules
+applied during decomposition, the list of components after each stage and the
+effect of each list pass. Traces are obtained with Speller.spell_trace or, for
+a sample of calls, passed to a sink given to the Speller constructor.
+
+"""
+
+__all__ = ['Trace', 'RuleMatch', 'PassResult']
+
+
+from collections import namedtuple
+
+
+# A rule applied to a (sub)number during decomposition
+RuleMatch = namedtuple('RuleMatch', 'number rule bindings components')
+
+# The list of numbers and orders before and after a list pass
+PassResult = namedtuple('PassResult', 'template before after')
+
+
+class Trace(object):
+    """The steps taken to spell a number
+
+    Attributes:
+      num            -- the number being spelled
+      rules          -- list of RuleMatch tuples in the order of application
+      decomposition  -- components produced by the rules
+      renumbered     -- components after the orders have been renumbered
+      squashed       -- components after consecutive orders were squashed
+      passes         -- list of PassResult tuples, one per list pass
+      components     -- final components after spelling out numbers and
+                        orders
+      result         -- the spelling
+
+    """
+
+    def __init__(self, num):
+        self.num = num
+        self.rules = []
+        self.decomposition = []
+        self.renumbered = []
+        self.squashed = []
+        self.passes = []
+        self.components = []
+        self.result = None
+
+    def format(self):
+        """Return a human-readable multi-line description of the trace"""
+        lines = ["Spelling %s" % self.num]
+        for match in self.rules:
+            lines.append("Rule '%s' applied to %s:" % (match.rule, match.number))
+            lines.append("    bindings: %s" % match.bindings)
+            lines.append("    components: %s" % match.components)
+        lines.append("Number decomposition:")
+        lines.append("    %s" % self.decomposition)
+        lines.append("Renumbered and squashed:")
+        lines.append("    %s" % self.squashed)
+        for pass_no, pass_ in enumerate(self.passes, 1):
+            if pass_.before == pass_.after:
+                continue
+            lines.append("Pass #%d:" % pass_no)
+            lines.append("    %s" % pass_.before)
+            lines.append("    -> %s" % pass_.template)
+            lines.append("    -> %s" % pass_.after)
+        lines.append("Final components:")
+        lines.append("    %s" % self.components)
+        lines.append("Result: %s" % self.result)
+        return '\n'.join(lines)
+
+    __str__ = format
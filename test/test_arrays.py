@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Tests for spelling NumPy arrays"""
+
+import random
+import unittest
+
+import numspell
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+LANGUAGES = ['en', 'es', 'ja', 'ru']
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class SpellArrayTest(unittest.TestCase):
+    def check(self, speller, array):
+        result = speller.spell_array(array)
+        self.assertEqual(array.shape, result.shape)
+        self.assertEqual(object, result.dtype)
+        for num, spelling in zip(array.flat, result.flat):
+            self.assertEqual(speller.spell(int(num)), spelling)
+
+    def test_random(self):
+        rng = random.Random(3)
+        for lang in LANGUAGES:
+            speller = numspell.Speller(lang, cache_size=0)
+            nums = [rng.randint(0, 10 ** rng.randint(1, 15))
+                    for _ in range(1000)]
+            # Many numbers share the higher groups
+            nums += [rng.choice(nums) // 1000 * 1000 + rng.randint(0, 999)
+                     for _ in range(1000)]
+            nums += nums[:100]
+            self.check(speller, numpy.array(nums, dtype=numpy.int64))
+
+    def test_cases(self):
+        for lang in LANGUAGES:
+            cases = __import__("cases_" + lang).TEST_CASES
+            nums = [x for x in cases if x < 2 ** 63]
+            speller = numspell.Speller(lang)
+            result = speller.spell_array(numpy.array(nums, dtype=numpy.int64))
+            self.assertEqual([cases[x] for x in nums], list(result))
+
+    def test_shapes(self):
+        speller = numspell.Speller('es')
+        self.check(speller, numpy.arange(2000, 2024).reshape(2, 3, 4))
+        self.check(speller, numpy.array(21000000))
+        self.check(speller, numpy.array([], dtype=numpy.int32))
+
+    def test_unsigned(self):
+        speller = numspell.Speller('en')
+        self.check(speller, numpy.array([2 ** 64 - 1, 2 ** 64 - 2, 7],
+                                        dtype=numpy.uint64))
+
+    def test_buffer(self):
+        speller = numspell.Speller('ru')
+        array = numpy.array([[1, 2000], [1, 0]])
+        buffer, offsets = speller.spell_array(array, as_buffer=True)
+        spellings = [buffer[offsets[i]:offsets[i+1]] for i in range(4)]
+        self.assertEqual([speller.spell(x) for x in [1, 2000, 1, 0]],
+                         spellings)
+
+    def test_instrumented(self):
+        speller = numspell.Speller('ja', stats=True)
+        self.check(speller, numpy.array([10001, 10002, 3]))
+        self.assertEqual(3 + 3, speller.stats()['spelled'])
+
+    def test_errors(self):
+        speller = numspell.Speller('en')
+        self.assertRaises(ValueError, speller.spell_array, numpy.array([1, -1]))
+        self.assertRaises(TypeError, speller.spell_array, numpy.array([1.5]))
+        # Same as spell() for numbers without an order word
+        speller = numspell.Speller('ru')
+        self.assertRaises(IndexError, speller.spell_array,
+                          numpy.array([10 ** 18, 10 ** 18 + 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import numspell
+from numspell import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_run(self):
+        result = benchmark.run(['ru'], count=10)
+        self.assertEqual(10, result['count'])
+        for op in ['spell', 'check']:
+            for name, _ in benchmark.DISTRIBUTIONS:
+                stats = result['results']['ru'][op][name]
+                self.assertEqual(10, stats['calls'])
+                self.assertTrue(stats['p50_us'] <= stats['p99_us'])
+
+    def test_options(self):
+        result = benchmark.run(['es'], count=5, pass_backend='regex')
+        self.assertEqual({'pass_backend': 'regex'}, result['options'])
+        self.assertEqual(5, result['results']['es']['spell']['small']['calls'])
+
+    def test_group_base(self):
+        bases = dict((lang, benchmark.group_base(numspell.Speller(lang)))
+                     for lang in benchmark.LANGUAGES)
+        self.assertEqual({'en': 10 ** 3, 'es': 10 ** 6, 'ja': 10 ** 4,
+                          'ru': 10 ** 3}, bases)
+
+    def test_compare(self):
+        def make(ops):
+            return {'results': {'en': {'spell': {'small': {'ops_per_sec': ops}}}}}
+        self.assertEqual([], benchmark.compare(make(95), make(100), 0.1))
+        self.assertEqual([('en', 'spell', 'small', 0.8)],
+                         benchmark.compare(make(80), make(100), 0.1))
+        self.assertEqual([], benchmark.compare(make(80), {'results': {}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
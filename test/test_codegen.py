@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Tests for the code generated for the rules and passes of a language"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numspell
+from numspell import codegen
+
+
+LANGUAGES = ['en', 'es', 'ja', 'ru']
+
+
+class CodegenTest(unittest.TestCase):
+    def test_cases(self):
+        for lang in LANGUAGES:
+            cases = __import__("cases_" + lang).TEST_CASES
+            speller = numspell.Speller(lang, cache_size=0, codegen=True)
+            for num, spelling in cases.items():
+                self.assertEqual(spelling, speller.spell(num))
+
+    def test_same_components(self):
+        rng = random.Random(7)
+        for lang in LANGUAGES:
+            interpreted = numspell.Speller(lang, cache_size=0)
+            generated = numspell.Speller(lang, cache_size=0, codegen=True)
+            group = interpreted._group_digits() or 3
+            digits = len(interpreted.ORDERS) * group
+            numbers = [rng.randint(1, 10 ** rng.randint(1, digits))
+                       for _ in range(2000)]
+            for num in map(str, range(1, 1200) + numbers):
+                self.assertEqual(interpreted._components(num),
+                                 generated._components(num))
+
+    def test_errors(self):
+        # Both engines fail the same way on numbers without orders
+        interpreted = numspell.Speller('ru', cache_size=0)
+        generated = numspell.Speller('ru', cache_size=0, codegen=True)
+        num = 10 ** (3 * len(interpreted.ORDERS))
+        self.assertRaises(IndexError, interpreted.spell, num)
+        self.assertRaises(IndexError, generated.spell, num)
+
+    def test_long_number(self):
+        speller = numspell.Speller('ja', codegen=True)
+        num = '1' * (codegen.MAX_DIGITS + 1)
+        self.assertRaises(IndexError, speller.spell, num)
+        self.assertEqual('一', speller.spell('0' * codegen.MAX_DIGITS + '1'))
+
+    def test_source(self):
+        speller = numspell.Speller('es')
+        source = codegen.generate(speller._rule_table, speller._parsers,
+                                  speller._number_strs)
+        self.assertTrue('def rule3_long(numstr, s, e, out):' in source)
+        self.assertTrue('# (a)xxxxxx = {a} {*} {x}' in source)
+        self.assertTrue('# <order> = {:pl}' in source)
+        compile(source, '<test>', 'exec')
+
+
+class CodegenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = codegen.cache_path(self.cache_dir, 'es')
+        codegen._code_cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        codegen._code_cache.clear()
+
+    def test_roundtrip(self):
+        speller = numspell.Speller('es', cache_dir=self.cache_dir,
+                                   codegen=True)
+        self.assertTrue(os.path.exists(self.path))
+
+        # The second speller must not generate anything
+        codegen._code_cache.clear()
+        generate = codegen.generate
+        codegen.generate = None
+        try:
+            cached = numspell.Speller('es', cache_dir=self.cache_dir,
+                                      codegen=True)
+        finally:
+            codegen.generate = generate
+        for num in [1, 21, 100, 1000, 21000000, 1000000000, 123456789]:
+            self.assertEqual(speller.spell(num), cached.spell(num))
+
+    def test_corrupt(self):
+        with open(self.path, 'wb') as file_:
+            file_.write('garbage')
+        speller = numspell.Speller('es', cache_dir=self.cache_dir,
+                                   codegen=True)
+        self.assertEqual('veintiún millones', speller.spell(21000000))
+
+
+if __name__ == '__main__':
+    unittest.main()
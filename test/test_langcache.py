@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Tests for the on-disk cache of compiled language definitions"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numspell
+from numspell import langcache, numspell as engine
+
+
+class LangCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir,
+                                 "spelling_es.v%d.cache" % langcache.CACHE_VERSION)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_roundtrip(self):
+        speller = numspell.Speller('es', cache_dir=self.cache_dir)
+        self.assertTrue(os.path.exists(self.path))
+
+        # The second speller must not parse anything
+        rule_from_str = engine.rule_from_str
+        engine.rule_from_str = None
+        try:
+            cached = numspell.Speller('es', cache_dir=self.cache_dir)
+        finally:
+            engine.rule_from_str = rule_from_str
+
+        for num in [1, 21, 100, 1000, 21000000, 1000000000, 123456789]:
+            self.assertEqual(speller.spell(num), cached.spell(num))
+
+    def test_stale(self):
+        module = engine.load_lang_module('es')
+        langcache.store(self.path, 'bogus digest', 'bogus payload')
+        self.assertEqual(None,
+                         langcache.load(self.path, langcache.source_digest(module)))
+
+        speller = numspell.Speller('es', cache_dir=self.cache_dir)
+        self.assertEqual('veintiún millones', speller.spell(21000000))
+        self.assertNotEqual(None,
+                            langcache.load(self.path, langcache.source_digest(module)))
+
+    def test_corrupt(self):
+        with open(self.path, 'wb') as file_:
+            file_.write('garbage')
+        speller = numspell.Speller('es', cache_dir=self.cache_dir)
+        self.assertEqual('un millón', speller.spell(1000000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """A test suite for the listparse module"""
 
+import pickle
 import unittest
 from numspell import listparse
 
@@ -145,6 +146,26 @@ class TestSearch(unittest.TestCase):
                             ['x', '1', 'and', 'mil', 'x'],
                         ])
 
+    def test_start(self):
+        parser = listparse.Parser("a b = ")
+        list_ = ['a', 'b', 'x', 'a', 'b']
+        self.assertEqual((0, 2), parser.pattern.search(list_, 0).span)
+        self.assertEqual((3, 5), parser.pattern.search(list_, 1).span)
+        self.assertEqual(None, parser.pattern.search(list_, 4))
+
+        parser = listparse.Parser("^ a = ")
+        self.assertEqual(None, parser.pattern.search(['a', 'a'], 1))
+
+    def test_overlapping(self):
+        self.build_test("a a b = ",
+                        good_inputs=[
+                            (['a', 'a', 'a', 'b'], (1, 4)),
+                            (['a', 'a', 'a', 'a', 'b', 'b'], (2, 5)),
+                        ],
+                        bad_inputs=[
+                            ['a', 'b', 'a', 'b'],
+                        ])
+
 
 class TestSubstitution(unittest.TestCase):
     def build_test(self, template, meta=None, good_inputs=[], bad_inputs=[]):
@@ -268,6 +289,14 @@ class TestSubstitution(unittest.TestCase):
                  (['once mil cien cien .'], [(0, 3)])),
             ])
 
+    def test_rescan(self):
+        # The substituted element may complete a match which starts before it
+        self.build_test(
+            "x b = b",
+            good_inputs=[
+                (['x', 'x', 'x', 'b'], (['b'], [(2, 4), (1, 3), (0, 2)])),
+            ])
+
     def test_combined(self):
         self.build_test(
             "(<gt_1>) <order> <lookup> $ = {:pl} {}",
@@ -297,5 +326,22 @@ class TestSubstitution(unittest.TestCase):
             ])
 
 
+class TestMatch(unittest.TestCase):
+    def test_groups(self):
+        parser = listparse.Parser("(<gt_1>) <order> <lookup> = {:pl} {}", meta)
+        first = parser.search(['2', 1, '1'])
+        second = parser.search(['.', '10', 'mil', '21'])
+        self.assertEqual([('order', 1), ('lookup', '1')],
+                         [(x.name, x.value) for x in first.subs])
+        self.assertEqual('millones un', parser.body.format(first.subs))
+        self.assertEqual('mil veintiún', parser.body.format(second.subs))
+
+    def test_immutable(self):
+        parser = listparse.Parser("<gt_1> <order> = {} {:pl}", meta)
+        state = pickle.dumps(parser, 2)
+        parser.sub(['2', 1, '90', 2])
+        self.assertEqual(state, pickle.dumps(parser, 2))
+
+
 if __name__ == '__main__':
     unittest.main()
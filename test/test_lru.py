@@ -0,0 +1,82 @@
+import threading
+import unittest
+from numspell.lru import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_get_put(self):
+        cache = LRUCache(2)
+        self.assertEqual(None, cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual('x', cache.get('b', 'x'))
+        self.assertEqual((1, 2, 2, 1), cache.info())
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEqual(2, len(cache))
+
+    def test_update(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('a', 2)
+        self.assertEqual(2, cache.get('a'))
+        self.assertEqual(1, len(cache))
+
+    def test_update_order(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 3)
+        cache.put('c', 4)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(3, cache.get('a'))
+
+    def test_zero_capacity(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(None, cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+    def test_clear(self):
+        cache = LRUCache(4)
+        for i in range(10):
+            cache.put(i, i)
+            cache.get(i)
+        cache.clear()
+        self.assertEqual((0, 0, 4, 0), cache.info())
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+
+
+    def test_threads(self):
+        cache = LRUCache(50)
+
+        def work(offset):
+            for i in range(5000):
+                key = (i * 7 + offset) % 100
+                if cache.get(key) is None:
+                    cache.put(key, key)
+
+        threads = [threading.Thread(target=work, args=(x,)) for x in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = cache.info()
+        self.assertEqual(20000, info.hits + info.misses)
+        self.assertEqual(50, len(cache))
+        for key in range(100):
+            self.assertTrue(cache.get(key) in (None, key))
+
+
+if __name__ == '__main__':
+    unittest.main()
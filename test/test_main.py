@@ -0,0 +1,86 @@
+"""Tests for the stream modes of the spellnum command"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import numspell
+from numspell import __main__ as cli
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_spellnum(args, stdin):
+    process = subprocess.Popen([sys.executable, '-m', 'numspell'] + args,
+                               cwd=ROOT, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate(stdin)
+    return process.returncode, out, err
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.speller = numspell.Speller('en')
+
+    def write_input(self, text):
+        path = os.path.join(self.tmpdir, 'input')
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_spell(self):
+        path = self.write_input('5\n\n21\n')
+        out = StringIO()
+        self.assertEqual(0, cli.spell_stream(self.speller, [path], True, out))
+        self.assertEqual('5\tfive\n21\ttwenty-one\n', out.getvalue())
+
+    def test_check(self):
+        path = self.write_input('5\tfive\n21\ttwenty one\n')
+        out = StringIO()
+        self.assertEqual(1, cli.check_stream(self.speller, [path], False, out))
+        self.assertEqual('twenty-one\n', out.getvalue())
+
+    def test_spelling_errors(self):
+        path = self.write_input('5\n-3\n7\n')
+        out = StringIO()
+        try:
+            cli.spell_stream(self.speller, [path], False, out)
+        except cli.InputError as e:
+            self.assertEqual('%s:2: Cannot spell a negative number: -3' % path,
+                             str(e))
+        else:
+            self.fail("InputError not raised")
+        self.assertEqual('five\n', out.getvalue())
+
+        path = self.write_input('5\tfive\n1%s\tlots\n' % ('0' * 200))
+        out = StringIO()
+        try:
+            cli.check_stream(self.speller, [path], False, out)
+        except cli.InputError as e:
+            self.assertEqual('%s:2: number too large to spell' % path, str(e))
+        else:
+            self.fail("InputError not raised")
+
+    def test_command(self):
+        self.assertEqual((0, 'five\ntwenty-one\n', ''),
+                         run_spellnum([], '5\n21\n'))
+        self.assertEqual((2, 'five\n', 'spellnum: -:2: invalid number: x\n'),
+                         run_spellnum([], '5\nx\n'))
+        self.assertEqual((2, 'five\n',
+                          'spellnum: -:2: Cannot spell a negative number: -3\n'),
+                         run_spellnum([], '5\n-3\n7\n'))
+
+    def test_check_without_number(self):
+        status, out, err = run_spellnum(['--check', 'fifteen'], '15\tfifteen\n')
+        self.assertEqual((2, ''), (status, out))
+        self.assertTrue('--check <spelling> requires a number' in err, err)
+
+
+if __name__ == '__main__':
+    unittest.main()
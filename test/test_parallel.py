@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numspell
+from numspell.parallel import spell_parallel
+
+
+class SpellParallelTest(unittest.TestCase):
+    def test_order(self):
+        for lang in ['es', 'ru']:
+            speller = numspell.Speller(lang)
+            nums = range(0, 3000000, 997)
+            self.assertEqual([speller.spell(x) for x in nums],
+                             list(speller.spell_parallel(iter(nums),
+                                                         processes=2,
+                                                         chunk_size=7)))
+
+    def test_pairs(self):
+        result = spell_parallel([2, 1], 'en', processes=1, pairs=True)
+        self.assertEqual([(2, 'two'), (1, 'one')], list(result))
+
+    def test_empty(self):
+        self.assertEqual([], list(spell_parallel([], 'ja', processes=1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Tests for the list passes applied with regular expressions"""
+
+import unittest
+
+import numspell
+from numspell import listparse, regexpass
+from numspell.numspell import apply_passes
+
+
+LANGUAGES = ['en', 'es', 'ja', 'ru']
+
+meta = {
+    "order~find": lambda x: type(x) is int,
+    "order~replace": lambda x: ['', 'M', 'B'][x],
+    "one~find": lambda x: x == '1',
+    "one~replace": lambda x: 'one',
+    "pl": lambda x: x + 's',
+}
+
+
+class RegexPassesTest(unittest.TestCase):
+    def check(self, passes, tokens):
+        parsers = [listparse.Parser(x, meta) for x in passes]
+        expected = apply_passes(tokens, passes, meta)
+        result = regexpass.RegexPasses(parsers, meta).apply(list(tokens))
+        self.assertEqual(expected, result)
+
+    def test_words(self):
+        tokens = ['', '1', ' and ', 2, ' ', '', '3', ' x', 1, '']
+        for passes in [["<one> <order> = {}"],
+                       ["<one> (<order>) = one"],
+                       ["(3) <order> = {:pl}"],
+                       ["^ 1 <order> = {}", "<order> = {:pl}"],
+                       ["<order> $ = last", "3 1 = 31"]]:
+            self.check(passes, tokens)
+
+    def test_overlapping(self):
+        # Each substitution allows a match ending with the new element
+        for passes in [["1 2 = 2"], ["1 (2) = 2"], ["^ 1 2 = 2"],
+                       ["1 2 3 = 3", "4 3 = 5"]]:
+            for tokens in [['7', '1', ' ', '1', '1', '2', '2'],
+                           ['1', '1', '2', '3', '2', '3', '4', '3']]:
+                self.check(passes, tokens)
+
+    def test_empty(self):
+        self.check(["<order> = {:pl}"], [])
+        self.check(["<order> = {:pl}"], ['', ' '])
+
+    def test_cases(self):
+        for lang in LANGUAGES:
+            cases = __import__("cases_" + lang).TEST_CASES
+            speller = numspell.Speller(lang, cache_size=0,
+                                       pass_backend='regex')
+            reference = numspell.Speller(lang, cache_size=0)
+            for num in cases:
+                numstr = str(num)
+                self.assertEqual(reference._components(numstr),
+                                 speller._components(numstr))
+                self.assertEqual(cases[num], speller.spell(num))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, numspell.Speller, 'es',
+                          pass_backend='bogus')
+
+
+if __name__ == '__main__':
+    unittest.main()
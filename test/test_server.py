@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Tests for the local spelling service"""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from numspell import server
+
+
+class ServerTestCase(unittest.TestCase):
+    address = ('127.0.0.1', 0)
+
+    def setUp(self):
+        self.service = server.SpellingService(['en', 'ru'], queue_size=4,
+                                              batch_size=8)
+        self.server = server.make_server(self.address, self.service)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.service.stop()
+
+    def connect(self):
+        family = socket.AF_INET
+        if isinstance(self.server.server_address, str):
+            family = socket.AF_UNIX
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(self.server.server_address)
+        self.addCleanup(sock.close)
+        return sock
+
+    def call(self, messages):
+        sock = self.connect()
+        sock.sendall(''.join(json.dumps(x) + '\n' for x in messages))
+        sock.shutdown(socket.SHUT_WR)
+        lines = sock.makefile().read().splitlines()
+        return [json.loads(x) for x in lines]
+
+
+class TCPServerTest(ServerTestCase):
+    def test_operations(self):
+        responses = self.call([
+            {'id': 1, 'number': 42},
+            {'id': 2, 'op': 'spell', 'lang': 'ru', 'number': '2000'},
+            {'id': 3, 'op': 'check', 'number': 3, 'spelling': 'tree'},
+            {'id': 4, 'op': 'check', 'number': 3, 'spelling': 'three'},
+            {'id': 5, 'op': 'parse', 'lang': 'ru', 'text': u'две тысячи'},
+        ])
+        self.assertEqual([
+            {'id': 1, 'spelling': 'forty-two'},
+            {'id': 2, 'spelling': u'две тысячи'},
+            {'id': 3, 'correct': False, 'spelling': 'three'},
+            {'id': 4, 'correct': True, 'spelling': 'three'},
+            {'id': 5, 'number': 2000},
+        ], responses)
+
+    def test_errors(self):
+        responses = self.call([
+            {'number': -1}, {'lang': 'xx', 'number': 1}, {'op': 'fly'},
+            {'op': 'spell'}, {'number': 1.5}, ['not', 'an', 'object'],
+            {'number': 1},
+        ])
+        self.assertEqual(7, len(responses))
+        for response in responses[:-1]:
+            self.assertTrue('error' in response, response)
+        self.assertEqual({'spelling': 'one'}, responses[-1])
+
+    def test_failed_requests(self):
+        responses = self.call([
+            {'lang': 'ru', 'number': 10 ** 20},
+            {'op': 'parse', 'text': 5},
+            {'lang': ['en'], 'number': 2},
+            {'op': {'spell': 1}, 'number': 2},
+            {'lang': 'ru', 'number': 2},
+            {'number': 2},
+        ])
+        for response in responses[:4]:
+            self.assertTrue('error' in response, response)
+        self.assertEqual([{'spelling': u'два'}, {'spelling': 'two'}],
+                         responses[4:])
+        self.assertEqual({'spelling': u'один'},
+                         self.call([{'lang': 'ru', 'number': 1}])[0])
+
+    def test_many_clients(self):
+        results = {}
+        def client(n):
+            messages = [{'id': i, 'number': n * 1000 + i} for i in range(50)]
+            results[n] = self.call(messages)
+        threads = [threading.Thread(target=client, args=(n,))
+                   for n in range(1, 6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        speller = self.service.spellers['en']
+        for n in range(1, 6):
+            self.assertEqual([{'id': i, 'spelling': speller.spell(n*1000 + i)}
+                              for i in range(50)], results[n])
+
+        metrics = self.call([{'op': 'metrics'}])[0]
+        self.assertEqual(250, metrics['requests'])
+        self.assertEqual(0, metrics['errors'])
+        self.assertTrue(metrics['batches'] <= 250)
+        self.assertTrue(metrics['mean_batch_size'] >= 1)
+        self.assertEqual({'en': 0, 'ru': 0}, metrics['queue_depth'])
+        self.assertEqual(set(['p50', 'p90', 'p99']),
+                         set(metrics['latency_us']))
+
+
+class UnixServerTest(ServerTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.address = os.path.join(self.dir, 'socket')
+        ServerTestCase.setUp(self)
+
+    def tearDown(self):
+        ServerTestCase.tearDown(self)
+        shutil.rmtree(self.dir)
+
+    def test_spell(self):
+        self.assertEqual([{'spelling': 'seven'}], self.call([{'number': 7}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Tests for the Speller API beyond plain spelling"""
+
+import threading
+import unittest
+import numspell
+
+
+class CacheTest(unittest.TestCase):
+    def test_counters(self):
+        speller = numspell.Speller('en')
+        speller.spell(1300)
+        speller.spell(1300)
+        info = speller.cache_info()
+        self.assertEqual(1, info['spelling'].hits)
+        self.assertEqual(1, info['spelling'].misses)
+        self.assertTrue(info['decomposition'].size > 0)
+
+        speller.cache_clear()
+        self.assertEqual(0, speller.cache_info()['spelling'].size)
+
+    def test_copies(self):
+        speller = numspell.Speller('es')
+        tokens = speller._parse_num(1000000)
+        tokens.append('garbage')
+        self.assertEqual(tokens[:-1], speller._parse_num(1000000))
+        self.assertEqual('un millón', speller.spell(1000000))
+
+    def test_disabled(self):
+        speller = numspell.Speller('ru', cache_size=0)
+        self.assertEqual('две тысячи', speller.spell(2000))
+        self.assertEqual('две тысячи', speller.spell(2000))
+        self.assertEqual(0, speller.cache_info()['spelling'].size)
+
+
+class SpellManyTest(unittest.TestCase):
+    def test_matches_spell(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            speller = numspell.Speller(lang)
+            nums = [0, 1, 21, 1000, 21000000, 123456789]
+            self.assertEqual([speller.spell(x) for x in nums],
+                             list(speller.spell_many(iter(nums))))
+
+    def test_pairs(self):
+        speller = numspell.Speller('en')
+        self.assertEqual([(1, 'one'), (20, 'twenty')],
+                         list(speller.spell_many([1, 20], pairs=True)))
+
+    def test_lazy(self):
+        def numbers():
+            yield 1
+            raise RuntimeError
+        spellings = numspell.Speller('en').spell_many(numbers())
+        self.assertEqual('one', next(spellings))
+        self.assertRaises(RuntimeError, next, spellings)
+
+
+class StatsTest(unittest.TestCase):
+    def test_disabled(self):
+        speller = numspell.Speller('en')
+        speller.spell(100)
+        self.assertEqual(None, speller.stats())
+
+    def test_counters(self):
+        for options in [{}, {'pass_backend': 'regex'}]:
+            speller = numspell.Speller('es', stats=True, **options)
+            self.assertEqual('un millón', speller.spell(1000000))
+            self.assertEqual('dos millones', speller.spell(2000000))
+            speller.spell(2000000)
+
+            stats = speller.stats()
+            self.assertEqual(2, stats['spelled'])
+            self.assertEqual(set(numspell.numspell.Stats.STAGES),
+                             set(stats['stages']))
+            for stage in stats['stages'].values():
+                self.assertEqual(2, stage['calls'])
+                self.assertTrue(stage['time'] >= 0)
+            self.assertEqual(2, stats['rules']['(a)xxxxxx = {a} {*} {x}'])
+            self.assertEqual(1, stats['passes']['^ 1 <order> = un {}'])
+            self.assertEqual(1, stats['passes']['<order> = {:pl}'])
+
+            speller.reset_stats()
+            stats = speller.stats()
+            self.assertEqual(0, stats['spelled'])
+            self.assertEqual(0, stats['passes']['<order> = {:pl}'])
+
+    def test_generated(self):
+        speller = numspell.Speller('es', stats=True, codegen=True)
+        # The generated code is timed, not the interpreted rules
+        speller._decompose = None
+        self.assertEqual('dos millones', speller.spell(2000000))
+        self.assertEqual(1, speller.stats()['passes']['<order> = {:pl}'])
+
+    def test_same_result(self):
+        for options in [{}, {'pass_backend': 'regex'}, {'codegen': True}]:
+            plain = numspell.Speller('ru', **options)
+            instrumented = numspell.Speller('ru', stats=True, **options)
+            for num in [0, 1, 2000, 21000000, 123456789012]:
+                self.assertEqual(plain.spell(num), instrumented.spell(num))
+
+
+class DigitsTest(unittest.TestCase):
+    def test_strings(self):
+        speller = numspell.Speller('en')
+        self.assertEqual(speller.spell(1234567), speller.spell('1234567'))
+        self.assertEqual(speller.spell(1234567), speller.spell(u'001234567'))
+        self.assertEqual('forty-two', speller.spell(b'42'))
+        self.assertEqual('zero', speller.spell('000'))
+
+    def test_index(self):
+        class Index(object):
+            def __init__(self, value):
+                self.value = value
+            def __index__(self):
+                return self.value
+
+        speller = numspell.Speller('en')
+        self.assertEqual('seven', speller.spell(Index(7)))
+        self.assertEqual('zero', speller.spell(Index(0)))
+        self.assertRaises(ValueError, speller.spell, Index(-7))
+        try:
+            import numpy
+        except ImportError:
+            return
+        for dtype in [numpy.uint64, numpy.uint32, numpy.int16]:
+            self.assertEqual('seven', speller.spell(dtype(7)))
+
+    def test_invalid(self):
+        speller = numspell.Speller('en')
+        for num in [-1, '', '-1', '1 2', u'\u0661', 1.5, None, True]:
+            self.assertRaises(ValueError, speller.spell, num)
+
+    def test_beyond_orders(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            speller = numspell.Speller(lang)
+            self.assertRaises(IndexError, speller.spell, 10 ** 200)
+
+    def test_deep(self):
+        # Far more nested groups than the recursion limit allows
+        speller = numspell.Speller('ru', cache_size=0)
+        tokens = speller._parse_num('1' + '0' * 30000)
+        self.assertEqual(['1'], [x for x in tokens if x and x.strip()])
+        self.assertEqual(10000, tokens.count(0))
+
+
+class RuleTableTest(unittest.TestCase):
+    def test_long_plans(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            table = numspell.Speller(lang)._rule_table
+            for length in range(table.max_length + 1, table.max_length + 30):
+                self.assertEqual(table._compile(length)[:1],
+                                 table.candidates(length))
+
+    def test_bounded(self):
+        speller = numspell.Speller('es', cache_size=0)
+        table = speller._rule_table
+        lengths = sorted(table._by_length)
+        speller._parse_num('1' + '0' * 3000)
+        speller._parse_num('2' + '3' * 3001)
+        self.assertEqual(lengths, sorted(table._by_length))
+        self.assertEqual(range(1, table.max_length + 1), lengths)
+
+
+class ThreadTest(unittest.TestCase):
+    def test_shared_speller(self):
+        # A small cache keeps the threads evicting each other's entries
+        for lang in ['es', 'ru']:
+            speller = numspell.Speller(lang, cache_size=64)
+            expected = numspell.Speller(lang, cache_size=0)
+            numbers = [x * 7919 + 21 for x in range(600)]
+            errors = []
+
+            def work(offset):
+                for num in numbers[offset:] + numbers[:offset]:
+                    spelling = speller.spell(num)
+                    if spelling != expected.spell(num):
+                        errors.append((num, spelling))
+
+            threads = [threading.Thread(target=work, args=(x * 150,))
+                       for x in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([], errors)
+
+
+class SpellIterTest(unittest.TestCase):
+    def test_cases(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            cases = __import__("cases_" + lang).TEST_CASES
+            speller = numspell.Speller(lang, cache_size=0)
+            for num, spelling in cases.items():
+                self.assertEqual(spelling.split(' '),
+                                 list(speller.spell_iter(num)))
+
+    def test_cached(self):
+        speller = numspell.Speller('es')
+        words = list(speller.spell_iter(21000000))
+        speller.spell(21000000)
+        self.assertEqual(words, list(speller.spell_iter(21000000)))
+        self.assertEqual(['cero'], list(speller.spell_iter('0')))
+
+
+class SpellRangeTest(unittest.TestCase):
+    def test_matches_spell(self):
+        ranges = [(0, 1100), (999990, 1001010), (21000995, 21001005),
+                  (10 ** 12 - 30, 10 ** 12 + 30, 7), (3001000, 2999000, -3)]
+        for lang in ['en', 'es', 'ja', 'ru']:
+            speller = numspell.Speller(lang)
+            for args in ranges:
+                self.assertEqual([speller.spell(x) for x in range(*args)],
+                                 list(speller.spell_range(*args)))
+
+    def test_pairs(self):
+        speller = numspell.Speller('es')
+        self.assertEqual([(1000001, 'un millón uno'),
+                          (1001000, 'un millón mil')],
+                         list(speller.spell_range(1000001, 1001001, 999,
+                                                  pairs=True)))
+
+    def test_instrumented(self):
+        speller = numspell.Speller('ru', stats=True)
+        self.assertEqual(['две тысячи', 'две тысячи один'],
+                         list(speller.spell_range(2000, 2002)))
+        self.assertEqual(2, speller.stats()['spelled'])
+
+    def test_zero_step(self):
+        speller = numspell.Speller('en')
+        self.assertRaises(ValueError, list, speller.spell_range(0, 10, 0))
+
+    def test_negative(self):
+        speller = numspell.Speller('en')
+        self.assertRaises(ValueError, list, speller.spell_range(-5, 5))
+        self.assertRaises(ValueError, list, speller.spell_range(3, -2, -2))
+        self.assertEqual(['one', 'zero'], list(speller.spell_range(1, -1, -1)))
+        self.assertEqual(['three'], list(speller.spell_range(3, -1, -4)))
+        self.assertEqual([], list(speller.spell_range(-5, -10)))
+
+
+class ParseTest(unittest.TestCase):
+    def test_cases(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            cases = __import__("cases_" + lang).TEST_CASES
+            speller = numspell.Speller(lang)
+            for num, spelling in cases.items():
+                self.assertEqual(num, speller.parse(spelling))
+
+    def test_pass_outputs(self):
+        speller = numspell.Speller('ru')
+        self.assertEqual(2000, speller.parse('две тысячи'))
+        self.assertEqual(5000, speller.parse('пять тысяч'))
+        self.assertEqual(3000000, speller.parse('три миллиона'))
+        speller = numspell.Speller('es')
+        self.assertEqual(21100, speller.parse('veintiún mil cien'))
+
+    def test_text(self):
+        speller = numspell.Speller('en')
+        self.assertEqual(1234, speller.parse(
+                u'  One thousand\ttwo hundred thirty-four\n'))
+        self.assertRaises(ValueError, speller.parse, 'one thousand and one')
+        self.assertRaises(ValueError, speller.parse, '')
+
+
+class CheckManyTest(unittest.TestCase):
+    def test_mismatches(self):
+        speller = numspell.Speller('es')
+        pairs = [(0, 'cero'), (1, 'uno'), (21, 'veintiuno'),
+                 (1000000, 'un millon'), (1001, 'mil'), (7, 'siete ocho'),
+                 (100, 'cien')]
+        self.assertEqual([(1000000, 'un millon', 'un millón'),
+                          (1001, 'mil', 'mil uno'),
+                          (7, 'siete ocho', 'siete'),
+                          (100, 'cien', 'ciento')],
+                         list(speller.check_many(iter(pairs))))
+
+    def test_cases(self):
+        for lang in ['en', 'es', 'ja', 'ru']:
+            cases = __import__("cases_" + lang).TEST_CASES
+            speller = numspell.Speller(lang, cache_size=0)
+            self.assertEqual([], list(speller.check_many(cases.items())))
+
+    def test_cached(self):
+        speller = numspell.Speller('en')
+        speller.spell(3)
+        self.assertEqual([(3, 'tree', 'three')],
+                         list(speller.check_many([(3, 'tree'), (3, 'three')])))
+
+
+class TraceTest(unittest.TestCase):
+    def test_trace(self):
+        speller = numspell.Speller('es')
+        trace = speller.spell_trace(21000000)
+        self.assertEqual(speller.spell(21000000), trace.result)
+        self.assertEqual('(a)xxxxxx = {a} {*} {x}', trace.rules[0].rule)
+        self.assertEqual({'a': '21', 'x': '000000'}, trace.rules[0].bindings)
+        self.assertEqual(['', '21', ' ', 0, ' ', ''], trace.decomposition)
+        self.assertEqual(['', '21', ' ', 1, ' ', ''], trace.squashed)
+        self.assertEqual(len(speller.PASSES), len(trace.passes))
+        self.assertEqual(['21', 1], trace.passes[0].before)
+        self.assertEqual(['veintiún', 'millones'], trace.passes[-1].after)
+        self.assertTrue('veintiún millones' in trace.format())
+
+    def test_zero(self):
+        self.assertEqual('zero', numspell.Speller('en').spell_trace(0).result)
+
+    def test_sampling(self):
+        traces = []
+        speller = numspell.Speller('ru', trace_every=3,
+                                   trace_sink=traces.append)
+        for num in range(1, 10):
+            speller.spell(num)
+        self.assertEqual([3, 6, 9], [x.num for x in traces])
+        self.assertEqual('три', traces[0].result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from numspell.squash import squash
+from numspell.numspell import renumber_orders, renumber_squash
+from numspell.squash import squash, isquash
 
 
 def isint(x):
@@ -42,6 +43,35 @@ class SquashTest(unittest.TestCase):
         for given, answer in known:
             self.assertEqual(answer, squash(isint, given))
 
+    def test_iterable(self):
+        given = iter([' ', 1, '', 2, 'a', 3, ' ', 4, ' '])
+        result = isquash(isint, given)
+        self.assertEqual(' ', next(result))
+        self.assertEqual([1, 'a', 3, ' '], list(result))
+
+    def test_long_list(self):
+        list_ = [1, ' '] * 100000 + ['a']
+        self.assertEqual([1, ' ', 'a'], squash(isint, list_))
+
+
+
+class RenumberSquashTest(unittest.TestCase):
+    def test_same_as_squash(self):
+        lists = [
+            [],
+            ['a', ' '],
+            [' ', '', 0, 0, 0, '', 0, ' '],
+            [0, 'a', 0, ' ', '', 0, 'b', 0, 0],
+            ['', '21', ' ', 0, ' ', 0, ' ', '', '3', ' ', 0, ''],
+            [0, ' '] * 1000 + ['a'],
+        ]
+        for list_ in lists:
+            expected = list_[:]
+            renumber_orders(expected)
+            expected = squash(isint, expected)
+            renumber_squash(list_)
+            self.assertEqual(expected, list_)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Tests for precomputed spelling tables"""
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import numspell
+from numspell import langcache, table as tablefile, numspell as engine
+from numspell.table import SpellingTable
+
+
+class SpellingTableTest(unittest.TestCase):
+    def test_build(self):
+        speller = numspell.Speller('ru')
+        table = SpellingTable.build(speller, 995, 1005)
+        self.assertEqual(10, len(table))
+        for num in range(995, 1005):
+            self.assertTrue(num in table)
+            self.assertEqual(speller.spell(num), table.get(num))
+        self.assertEqual('тысяча', table.get(1000))
+
+    def test_outside(self):
+        table = SpellingTable.build(numspell.Speller('en'), 10, 20)
+        for num in [9, 20, -1, '15', 15L, None]:
+            self.assertFalse(num in table)
+            self.assertEqual('x', table.get(num, 'x'))
+        self.assertRaises(ValueError, SpellingTable.build,
+                          numspell.Speller('en'), 20, 10)
+
+    def test_chain(self):
+        table = SpellingTable.build(numspell.Speller('en'), 0, 3)
+        get = table.chain(lambda num: 'fallback')
+        self.assertEqual('two', get(2))
+        self.assertEqual('fallback', get(3))
+
+    def test_empty(self):
+        table = SpellingTable.build(numspell.Speller('en'), 5, 5)
+        self.assertEqual(0, len(table))
+        self.assertEqual(None, table.get(5))
+
+
+class SpellerTableTest(unittest.TestCase):
+    def test_lookup(self):
+        speller = numspell.Speller('es', table_range=(0, 2000))
+        plain = numspell.Speller('es')
+        for num in [0, 1, 21, 100, 1001, 1999, 10 ** 6]:
+            self.assertEqual(plain.spell(num), speller.spell(num))
+        self.assertEqual([plain.spell(x) for x in range(1990, 2010)],
+                         list(speller.spell_many(range(1990, 2010))))
+        # Table hits do not go through the spelling cache
+        self.assertEqual(0, speller.cache_info()['spelling'].hits)
+        self.assertEqual(2000, len(speller.table))
+
+    def test_stats(self):
+        speller = numspell.Speller('en', stats=True, table_range=(0, 100))
+        self.assertEqual(0, speller.stats()['spelled'])
+        speller.spell(5)
+        self.assertEqual(0, speller.stats()['spelled'])
+
+
+class TableFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'es.table')
+        self.digest = langcache.source_digest(engine.load_lang_module('es'))
+        self.speller = numspell.Speller('es')
+        SpellingTable.build(self.speller, 990, 1010).save(self.path, 'es',
+                                                          self.digest)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        table = tablefile.load(self.path, 'es', self.digest)
+        self.assertEqual((990, 1010), (table.start, table.stop))
+        self.assertEqual(21, len(table.offsets))
+        for num in range(980, 1020):
+            self.assertEqual(num in table and self.speller.spell(num) or None,
+                             table.get(num))
+        get = table.chain(lambda num: 'fallback')
+        self.assertEqual('mil', get(1000))
+        self.assertEqual('fallback', get(1010))
+        table.close()
+
+    def test_mismatch(self):
+        self.assertRaises(ValueError, tablefile.load, self.path, 'en',
+                          self.digest)
+        self.assertRaises(ValueError, tablefile.load, self.path, 'es',
+                          '0' * 40)
+        with open(self.path, 'rb') as file_:
+            data = file_.read()
+        for corrupt in [data[:-1], 'x' + data[1:], data[:10]]:
+            os.chmod(self.path, 0o644)
+            with open(self.path, 'wb') as file_:
+                file_.write(corrupt)
+            self.assertRaises(ValueError, tablefile.load, self.path, 'es',
+                              self.digest)
+
+    def test_speller(self):
+        speller = numspell.Speller('es', table_path=self.path)
+        self.assertEqual('mil', speller.spell(1000))
+        self.assertEqual('un millón', speller.spell(1000000))
+        info = speller.cache_info()['spelling']
+        self.assertEqual((0, 1), (info.hits, info.misses))
+
+        logging.disable(logging.WARNING)
+        try:
+            speller = numspell.Speller('en', table_path=self.path,
+                                       table_range=(0, 10))
+        finally:
+            logging.disable(logging.NOTSET)
+        self.assertEqual((0, 10), (speller.table.start, speller.table.stop))
+
+
+if __name__ == '__main__':
+    unittest.main()